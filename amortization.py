@@ -0,0 +1,1128 @@
+# Author: Hobs Towler
+# Date: 10/18/2026
+# Description: Array-backed amortization math used by the Loan classes.
+import calendar
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from fractions import Fraction
+
+import numpy as np
+
+from numeric import round_cents
+
+
+class ScheduleCache:
+    """
+    A bounded least recently used cache of amortization schedules keyed by a fingerprint of the loan's parameters.
+    Keeps hit and miss counters so the cache can be sized from real usage.
+    """
+    def __init__(self, maxsize: int = 128) -> None:
+        """
+        Initializes an empty cache.
+        :param maxsize: The maximum number of schedules held before the least recently used one is evicted.
+        """
+        self._entries = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns the cached schedule for a fingerprint and marks it as most recently used.
+        :param key: The fingerprint of the schedule.
+        :return: The cached schedule or None if it is not in the cache.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries.get(key)
+        self.misses += 1
+        return None
+
+    def put(self, key, schedule) -> None:
+        """
+        Adds a schedule to the cache, evicting the least recently used schedules if the cache is full.
+        :param key: The fingerprint of the schedule.
+        :param schedule: The schedule to cache.
+        """
+        self._entries[key] = schedule
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def discard(self, keys) -> None:
+        """
+        Removes schedules from the cache.
+        :param keys: The fingerprints to remove. Missing fingerprints are ignored.
+        """
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def resize(self, maxsize: int) -> None:
+        """
+        Changes the maximum size of the cache, evicting schedules if it shrinks.
+        :param maxsize: The new maximum number of schedules.
+        """
+        self.maxsize = maxsize
+        self._evict()
+
+    def clear(self) -> None:
+        """
+        Removes every schedule and resets the counters.
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+        :return: A dict with the hits, misses, current size and maximum size of the cache.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize
+        }
+
+    def _evict(self) -> None:
+        """
+        Internal method to drop the least recently used schedules until the cache fits its maximum size.
+        """
+        while len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+
+
+class Schedule:
+    """
+    A compact columnar amortization schedule. The month, balance, interest and extra payment of every row are stored in
+    typed arrays instead of one list per row. Columns can be handed to plotting and table code without copying, and rows
+    can still be read as [month, balance, interest, extra] lists.
+    """
+    columns = ('month', 'balance', 'interest', 'extra')
+
+    def __init__(self, month=None, balance=None, interest=None, extra=None) -> None:
+        """
+        Initializes the schedule from existing columns, or as an empty schedule to append rows to.
+        :param month: The month column. A paid off month is recorded as month 0.
+        :param balance: The remaining principal column.
+        :param interest: The interest column.
+        :param extra: The extra payment column.
+        """
+        self._month = array('i') if month is None else month
+        self._balance = array('d') if balance is None else balance
+        self._interest = array('d') if interest is None else interest
+        self._extra = array('d') if extra is None else extra
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds a schedule from [month, balance, interest, extra] rows.
+        :param rows: An iterable of rows.
+        :return: The schedule.
+        """
+        schedule = cls()
+        for row in rows:
+            schedule.append(*row)
+        return schedule
+
+    def append(self, month, balance, interest, extra) -> None:
+        """
+        Appends a row to the schedule.
+        """
+        self._month.append(month)
+        self._balance.append(balance)
+        self._interest.append(interest)
+        self._extra.append(extra)
+
+    def column(self, name: str):
+        """
+        Returns a column of the schedule without copying it.
+        :param name: 'month', 'balance', 'interest' or 'extra'.
+        :return: The column.
+        """
+        if name not in self.columns:
+            raise KeyError(name)
+        return getattr(self, f'_{name}')
+
+    def array(self, name: str) -> np.ndarray:
+        """
+        Returns a column of the schedule as a read-only numpy array sharing the column's memory. Schedules are shared
+        through the schedule cache, so callers that need to change the values must copy them.
+        :param name: 'month', 'balance', 'interest' or 'extra'.
+        :return: The numpy view of the column.
+        """
+        view = np.asarray(self.column(name)).view()
+        view.setflags(write=False)
+        return view
+
+    def rows(self) -> list:
+        """
+        Returns the schedule as a list of [month, balance, interest, extra] rows.
+        :return: The list of rows.
+        """
+        return [self[i] for i in range(len(self))]
+
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes used by the columns of the schedule.
+        :return: The size of the columns in bytes.
+        """
+        return sum(len(self.column(name)) * self.column(name).itemsize for name in self.columns)
+
+    def __len__(self) -> int:
+        return len(self._month)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Schedule(self._month[index], self._balance[index], self._interest[index], self._extra[index])
+        return [self._month[index], self._balance[index], self._interest[index], self._extra[index]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Schedule):
+            return NotImplemented
+        return all(list(self.column(name)) == list(other.column(name)) for name in self.columns)
+
+
+class ScheduleStream:
+    """
+    An iterator over amortization schedule rows that are calculated lazily. Iteration can be stopped early, either by
+    limiting the number of months or by closing the stream, and the totals of the rows produced are available from the
+    summary once the stream is finished.
+    """
+    def __init__(self, rows, summary: dict, first_row: tuple = None, months: int = None) -> None:
+        """
+        Initializes the stream.
+        :param rows: A generator of schedule rows that writes its totals into summary when it finishes or is closed.
+        :param summary: The dict the generator writes its totals into.
+        :param first_row: Optional. A row yielded before the generated rows, usually month 0.
+        :param months: Optional. The number of generated rows after which the stream stops.
+        """
+        self._rows = rows
+        self._summary = summary
+        self._first_row = first_row
+        self._remaining = months
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> tuple:
+        if self._first_row is not None:
+            row, self._first_row = self._first_row, None
+            return row
+        if self._finished or self._remaining == 0:
+            self.close()
+            raise StopIteration
+        try:
+            row = next(self._rows)
+        except StopIteration:
+            self._finished = True
+            raise
+        if self._remaining is not None:
+            self._remaining -= 1
+        return row
+
+    def close(self) -> None:
+        """
+        Stops the stream early. The summary then covers the rows produced so far.
+        """
+        self._rows.close()
+        self._finished = True
+
+    @property
+    def summary(self) -> dict:
+        """
+        The totals of the rows produced: 'total', 'total interest', 'monthly payment', 'last month' (None if the loan
+        was not paid off within the rows produced), 'months' and whether the schedule is 'complete'.
+        :return: The summary, or None while the stream is still running.
+        """
+        return self._summary if self._finished else None
+
+
+def monthly_rate(rate):
+    """
+    Converts an annual percentage rate into the monthly rate used for amortization.
+    :param rate: The annual rate as a percentage. May be a scalar or an array.
+    :return: The monthly rate as a fraction.
+    """
+    return np.asarray(rate, dtype=float) / 100 / 12
+
+
+def monthly_payment(principal, m_rate, term):
+    """
+    Calculates the scheduled monthly payment the same way Loan.calc_monthly does, element-wise on arrays. A rate of
+    zero spreads the principal evenly over the term.
+    :param principal: The principal of the loan.
+    :param m_rate: The monthly rate as a fraction.
+    :param term: The term in months.
+    :return: The monthly payment rounded to the cent.
+    """
+    principal, m_rate, term = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (principal, m_rate, term)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        compound = np.power(1 + m_rate, term)
+        payment = np.where(m_rate == 0, principal / term, (principal * m_rate * compound) / (compound - 1))
+    return round_cents(payment)
+
+
+def to_cents(amount) -> int:
+    """
+    Converts a dollar amount to integer cents.
+    :param amount: The dollar amount.
+    :return: The amount in cents.
+    """
+    return int(round(float(amount) * 100))
+
+
+def divide_cents(numerator: int, denominator: int, rounding: str = 'half up') -> int:
+    """
+    Divides two integers and rounds the quotient to a whole number of cents with an explicit rounding rule.
+    :param numerator: The numerator.
+    :param denominator: The denominator. Must be positive.
+    :param rounding: 'half up' (half away from zero), 'half even' (banker's rounding) or 'down' (truncate).
+    :return: The rounded quotient.
+    """
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if rounding == 'half up':
+        quotient += 2 * remainder >= denominator
+    elif rounding == 'half even':
+        twice = 2 * remainder
+        quotient += twice > denominator or (twice == denominator and quotient % 2 == 1)
+    elif rounding != 'down':
+        raise ValueError(f'Unknown rounding rule: {rounding}')
+    return quotient if numerator >= 0 else -quotient
+
+
+def amortize_cents(principal: int, rate, payment: int, extras: list, term: int, rounding: str = 'half up',
+                   periods: int = 12) -> dict:
+    """
+    Amortizes a loan month by month entirely in integer cents, so there is no floating point drift in the balance and
+    the monthly interest is rounded with an explicit rule, the way lenders calculate statements.
+    :param principal: The starting principal in cents.
+    :param rate: The annual rate as a percentage. Converted exactly from its decimal representation.
+    :param payment: The scheduled monthly payment in cents.
+    :param extras: Optional. The extra payment in cents made in each month, indexed by month.
+    :param term: The number of months to amortize.
+    :param rounding: The rounding rule for monthly interest. See divide_cents.
+    :param periods: The number of payment periods per year. Months are payment periods when it is not 12.
+    :return: A dict of rows of [month, balance, interest, extra] in cents and totals in cents.
+    """
+    m_rate = Fraction(str(rate)) / (100 * periods)
+    numerator = m_rate.numerator
+    denominator = m_rate.denominator
+    if rounding not in ('half up', 'half even', 'down'):
+        raise ValueError(f'Unknown rounding rule: {rounding}')
+    half_up = rounding == 'half up'
+
+    schedule = [[0, principal, 0, 0]]
+    total_interest = 0
+    total = 0
+    last_month = 0
+    for i in range(1, term + 1):
+        if principal != 0:
+            if half_up and principal > 0:
+                interest = (2 * principal * numerator + denominator) // (2 * denominator)
+            else:
+                interest = divide_cents(principal * numerator, denominator, rounding)
+            extra = extras[i] if extras is not None else 0
+            principal = principal + interest - payment - extra
+            if principal < 0:
+                extra -= principal
+                principal = 0
+                last_month = i
+            schedule.append([i, principal, interest, extra])
+            total_interest += interest
+            total += extra + interest + principal
+        else:
+            schedule.append([0, 0, 0, 0])
+
+    return {
+        'total': total,
+        'total interest': total_interest,
+        'last month': last_month if last_month != 0 else term,
+        'schedule': schedule
+    }
+
+
+def amortize(principal, m_rate, payment, extras, term: int, terms=None) -> dict:
+    """
+    Amortizes a batch of loans month by month using numpy arrays, advancing every loan one month at a time in a single
+    vectorized step. Interest is rounded to the cent every month, matching Loan.calc_m_interest.
+    :param principal: The starting principal of each loan. Shape (n,).
+    :param m_rate: The monthly rate of each loan as a fraction. Shape (n,).
+    :param payment: The scheduled monthly payment of each loan. Shape (n,).
+    :param extras: The extra payment made in each month of each loan. Shape (n, term + 1), column 0 is unused.
+    :param term: The number of months to amortize.
+    :param terms: Optional. The term of each loan when they differ. Loans stop amortizing after their own term.
+    :return: A dict of columnar arrays (balance, interest, extra) of shape (n, term + 1) and per-loan totals.
+    """
+    principal = np.asarray(principal, dtype=float)
+    m_rate = np.asarray(m_rate, dtype=float)
+    payment = np.asarray(payment, dtype=float)
+    n = principal.shape[0]
+    terms = np.full(n, term) if terms is None else np.asarray(terms, dtype=int)
+
+    balance = np.zeros((n, term + 1))
+    interest = np.zeros((n, term + 1))
+    extra = np.zeros((n, term + 1))
+    balance[:, 0] = principal
+
+    current = principal.copy()
+    total_interest = np.zeros(n)
+    total = np.zeros(n)
+    last_month = np.zeros(n, dtype=int)
+    for i in range(1, term + 1):
+        active = (current != 0) & (i <= terms)
+        m_interest = np.where(active, round_cents(current * m_rate), 0)
+        m_extra = extras[:, i]
+        remaining = current + m_interest - payment - m_extra
+
+        paid_off = active & (remaining < 0)
+        m_extra = np.where(paid_off, m_extra - remaining, m_extra)
+        remaining = np.where(paid_off, 0, remaining)
+        last_month = np.where(paid_off, i, last_month)
+
+        current = np.where(active, remaining, current)
+        balance[:, i] = np.where(active, current, 0)
+        interest[:, i] = m_interest
+        extra[:, i] = np.where(active, m_extra, 0)
+        total_interest += m_interest
+        total += np.where(active, m_extra + m_interest + remaining, 0)
+
+    last_month = np.where(last_month == 0, terms, last_month)
+
+    return {
+        'total': round_cents(total),
+        'total interest': round_cents(total_interest),
+        'last month': last_month,
+        'balance': balance,
+        'interest': interest,
+        'extra': extra
+    }
+
+
+def first_periods(months: int, periods: int) -> np.ndarray:
+    """
+    Returns the first payment period in each month of a loan paid a given number of times a year. Month 0 maps to
+    period 0.
+    :param months: The number of months.
+    :param periods: The number of payment periods per year.
+    :return: The first period of each month, indexed by month.
+    """
+    first = (np.arange(months + 1) - 1) * periods // 12 + 1
+    first[0] = 0
+    return first
+
+
+def period_extras(extras: np.ndarray, periods: int) -> np.ndarray:
+    """
+    Maps extra payments by month onto payment periods. Each month's extra payment is made with the first payment of
+    that month.
+    :param extras: The extra payment in each month, indexed by month on the last axis.
+    :param periods: The number of payment periods per year.
+    :return: The extra payment in each period, indexed by period on the last axis.
+    """
+    if periods == 12:
+        return extras
+    months = extras.shape[-1] - 1
+    mapped = np.zeros(extras.shape[:-1] + (months * periods // 12 + 1,))
+    mapped[..., first_periods(months, periods)[1:]] = extras[..., 1:]
+    return mapped
+
+
+def extra_payment_matrix(plans, term: int) -> np.ndarray:
+    """
+    Builds the month by month extra payments for a batch of loans. Every ExtraPayment adds its amount at its start month
+    and removes it at its end month of a difference array, which is then summed along the months.
+    :param plans: A list with one list of ExtraPayment objects per loan.
+    :param term: The number of months to build.
+    :return: The extra payments, shape (len(plans), term + 1). Column 0 is always 0.
+    """
+    diff = np.zeros((len(plans), term + 2))
+    for row, plan in enumerate(plans):
+        for e in plan:
+            start = min(max(e.start, 1), term + 1)
+            end = min(max(e.end, start), term + 1)
+            diff[row, start] += e.amount
+            diff[row, end] -= e.amount
+    extras = np.cumsum(diff[:, :term + 1], axis=1)
+    extras[:, 0] = 0
+    return extras
+
+
+def amortize_batch(principal, rate, term, payment, plans=None, chunk_size: int = 10000,
+                   keep_schedules: bool = True, periods=None) -> dict:
+    """
+    Amortizes a portfolio of loans as a single loans x periods computation. Loans are processed in chunks to bound
+    memory, and the monthly cash flows of every loan are aggregated into portfolio totals.
+    :param principal: The principal of each loan.
+    :param rate: The annual rate of each loan as a percentage.
+    :param term: The term of each loan in months.
+    :param payment: The scheduled payment of each loan per payment period.
+    :param plans: Optional. One list of ExtraPayment objects per loan.
+    :param chunk_size: The number of loans amortized together.
+    :param keep_schedules: Whether the per loan balance, interest and extra arrays are kept in the result.
+    :param periods: Optional. The number of payment periods per year of each loan. Defaults to 12.
+    :return: A dict with per loan results under 'loans', indexed by payment period, and aggregated monthly cash flows
+    under 'portfolio'.
+    """
+    principal = np.asarray(principal, dtype=float)
+    months = np.asarray(term, dtype=int)
+    payment = np.asarray(payment, dtype=float)
+    n = principal.shape[0]
+    periods = np.full(n, 12) if periods is None else np.asarray(periods, dtype=int)
+    m_rate = np.asarray(rate, dtype=float) / 100 / periods
+    terms = months * periods // 12
+    max_month = int(months.max()) if n > 0 else 0
+    max_term = int(terms.max()) if n > 0 else 0
+    if plans is None:
+        plans = [[] for _ in range(n)]
+
+    per_loan = {key: [] for key in ('total', 'total interest', 'last month', 'balance', 'interest', 'extra')}
+    portfolio = {key: np.zeros(max_month + 1) for key in ('balance', 'interest', 'principal', 'extra', 'payment')}
+    for start in range(0, n, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        chunk_periods = periods[chunk]
+        monthly_extras = extra_payment_matrix(plans[chunk], max_month)
+        extras = np.zeros((monthly_extras.shape[0], max_term + 1))
+        for p in np.unique(chunk_periods):
+            rows = chunk_periods == p
+            mapped = period_extras(monthly_extras[rows], int(p))
+            extras[rows, :mapped.shape[1]] = mapped
+        result = amortize(principal[chunk], m_rate[chunk], payment[chunk], extras, max_term, terms[chunk])
+
+        balance = result.get('balance')
+        principal_paid = np.zeros_like(balance)
+        principal_paid[:, 1:] = balance[:, :-1] - balance[:, 1:]
+        in_term = np.arange(1, max_term + 1) <= terms[chunk, None]
+        principal_paid[:, 1:] = np.where(in_term & (balance[:, :-1] != 0), principal_paid[:, 1:], 0)
+        flows = {'interest': result.get('interest'), 'principal': principal_paid, 'extra': result.get('extra')}
+        for p in np.unique(chunk_periods):
+            rows = chunk_periods == p
+            ends = np.arange(max_month + 1) * int(p) // 12
+            portfolio['balance'] += balance[rows][:, ends].sum(axis=0)
+            for name, values in flows.items():
+                cumulative = np.cumsum(values[rows].sum(axis=0))[ends]
+                portfolio[name] += np.diff(cumulative, prepend=0)
+
+        keys = per_loan.keys() if keep_schedules else ('total', 'total interest', 'last month')
+        for key in keys:
+            per_loan[key].append(result.get(key))
+
+    portfolio['payment'] = portfolio.get('interest') + portfolio.get('principal')
+    loans = {key: np.concatenate(value) for key, value in per_loan.items() if value}
+    loans.update({'monthly payment': payment, 'periods': periods})
+
+    return {
+        'loans': loans,
+        'portfolio': portfolio
+    }
+
+
+def amortize_portfolio(loans: list, extra_payments: bool = True, keep_schedules: bool = False, **kwargs) -> dict:
+    """
+    Amortizes a list of Loan objects in one batch at each loan's own payment frequency. See amortize_batch for the
+    structure of the result.
+    :param loans: The Loan objects to amortize.
+    :param extra_payments: Whether each loan's extra payments are applied.
+    :param keep_schedules: Whether the per loan balance, interest and extra arrays are kept. Each kept array holds 8
+    bytes per loan per payment period, so by default only the per loan totals are returned.
+    :return: Per loan results and aggregated monthly cash flows.
+    """
+    principal = [loan.data('principal') for loan in loans]
+    rate = [float(loan.data('rate')) for loan in loans]
+    term = [int(loan.data('term')) for loan in loans]
+    payment = [loan.periodic_payment() for loan in loans]
+    periods = [loan.periods_per_year() for loan in loans]
+    plans = [loan.get_extra_payments() if extra_payments else [] for loan in loans]
+
+    return amortize_batch(principal, rate, term, payment, plans, keep_schedules=keep_schedules, periods=periods,
+                          **kwargs)
+
+
+def extra_payment_segments(plan, term: int) -> list:
+    """
+    Splits months 1 through term into segments over which the total extra payment is constant.
+    :param plan: A list of ExtraPayment objects.
+    :param term: The term of the loan in months.
+    :return: A list of (start, end, amount) segments. The end month is exclusive.
+    """
+    deltas = {1: 0, term + 1: 0}
+    for e in plan:
+        start = min(max(e.start, 1), term + 1)
+        end = min(max(e.end, start), term + 1)
+        deltas[start] = deltas.get(start, 0) + e.amount
+        deltas[end] = deltas.get(end, 0) - e.amount
+
+    segments = []
+    amount = 0
+    months = sorted(deltas)
+    for start, end in zip(months, months[1:]):
+        amount += deltas.get(start)
+        segments.append((start, end, amount))
+    return segments
+
+
+def segment_balance(balance, m_rate, payment, months):
+    """
+    Returns the balance after a number of months of constant payments at a constant rate, using the closed form of
+    the amortization recurrence. Works element-wise on arrays.
+    :param balance: The balance at the start of the segment.
+    :param m_rate: The monthly rate as a fraction.
+    :param payment: The total payment made each month.
+    :param months: The number of months.
+    :return: The balance after the given number of months.
+    """
+    balance, m_rate, payment, months = np.broadcast_arrays(*(np.asarray(v, dtype=float)
+                                                             for v in (balance, m_rate, payment, months)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.power(1 + m_rate, months)
+        annuity = np.where(m_rate == 0, months, (growth - 1) / m_rate)
+    return balance * growth - payment * annuity
+
+
+def months_to_payoff(balance, m_rate, payment):
+    """
+    Returns the number of months of constant payments needed to bring a balance to zero or below. Works element-wise on
+    arrays.
+    :param balance: The starting balance.
+    :param m_rate: The monthly rate as a fraction.
+    :param payment: The total payment made each month.
+    :return: The number of months, or inf if the payment never covers the interest.
+    """
+    balance, m_rate, payment = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (balance, m_rate, payment)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covered = payment > balance * m_rate
+        exact = np.where(m_rate == 0, balance / payment,
+                         np.log(payment / (payment - balance * m_rate)) / np.log1p(m_rate))
+        months = np.ceil(exact - 1e-9)
+    return np.where(balance <= 0, 0, np.where(covered, months, np.inf))
+
+
+def months_to_balance(balance, m_rate, payment, target):
+    """
+    Returns the number of months of constant payments needed to bring a balance down to a target balance or below.
+    Works element-wise on arrays.
+    :param balance: The starting balance.
+    :param m_rate: The monthly rate as a fraction.
+    :param payment: The total payment made each month.
+    :param target: The target balance.
+    :return: The number of months, or inf if the payment never covers the interest.
+    """
+    balance, m_rate, payment, target = np.broadcast_arrays(*(np.asarray(v, dtype=float)
+                                                             for v in (balance, m_rate, payment, target)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covered = payment > balance * m_rate
+        exact = np.where(m_rate == 0, (balance - target) / payment,
+                         np.log((payment - target * m_rate) / (payment - balance * m_rate)) / np.log1p(m_rate))
+        months = np.ceil(exact - 1e-9)
+    return np.where(balance <= target, 0, np.where(covered, months, np.inf))
+
+
+def solve_segments(principal, segments, until: int = None) -> dict:
+    """
+    Walks a loan through segments of constant rate and payment in closed form.
+    :param principal: The starting principal.
+    :param segments: A list of (start, end, m_rate, payment) segments in month order. The end month is exclusive.
+    :param until: Optional. Stops after this month.
+    :return: A dict with the remaining 'balance', the 'total interest' paid and the 'last month' if the loan was paid
+    off, otherwise None.
+    """
+    balance = float(principal)
+    total_interest = 0
+    last_month = None
+    for start, end, m_rate, payment in segments:
+        if until is not None:
+            if start > until:
+                break
+            end = min(end, until + 1)
+        months = end - start
+        if months <= 0:
+            continue
+
+        needed = float(months_to_payoff(balance, m_rate, payment))
+        if needed <= months:
+            months = int(needed)
+            last_month = start + months - 1
+        remaining = float(segment_balance(balance, m_rate, payment, months))
+        total_interest += remaining - balance + months * payment
+        balance = remaining
+        if last_month is not None:
+            balance = 0
+            break
+
+    return {
+        'balance': balance,
+        'total interest': total_interest,
+        'last month': last_month
+    }
+
+
+def reset_rates(initial, index, margin, initial_cap, periodic_cap, lifetime_cap, floor) -> np.ndarray:
+    """
+    Calculates the rate after each reset of an adjustable rate loan. Each reset moves the rate toward the index plus the
+    margin, limited by the initial cap at the first reset, the periodic cap after that, the lifetime cap above the
+    initial rate and the rate floor. Works on many index paths at once.
+    :param initial: The initial annual rate as a percentage.
+    :param index: The index rate at each reset, with resets on the last axis.
+    :param margin: The margin added to the index.
+    :param initial_cap: The largest change at the first reset.
+    :param periodic_cap: The largest change at every later reset.
+    :param lifetime_cap: The largest increase over the initial rate.
+    :param floor: The lowest rate.
+    :return: The annual rate after each reset, rounded to 3 decimals, in the shape of index.
+    """
+    index = np.asarray(index, dtype=float)
+    rates = np.empty_like(index)
+    rate = np.full(index.shape[:-1], float(initial))
+    for reset in range(index.shape[-1]):
+        cap = initial_cap if reset == 0 else periodic_cap
+        rate = np.clip(index[..., reset] + margin, rate - cap, rate + cap)
+        rate = np.round(np.maximum(np.minimum(rate, initial + lifetime_cap), floor), 3)
+        rates[..., reset] = rate
+    return rates
+
+
+def reset_months(term: int, initial_period: int, reset_interval: int) -> np.ndarray:
+    """
+    Returns the first month of every rate period of an adjustable rate loan, starting with month 1.
+    :param term: The term of the loan in months.
+    :param initial_period: The number of months at the initial rate.
+    :param reset_interval: The number of months between resets.
+    :return: The start months of the rate periods.
+    """
+    return np.concatenate(([1], np.arange(initial_period + 1, term + 1, reset_interval))).astype(int)
+
+
+def amortize_rate_paths(principal, rate, term: int, payment, starts, rates) -> dict:
+    """
+    Amortizes an adjustable rate loan along many rate paths at once. The payment is re-solved from the balance whenever
+    the rate changes.
+    :param principal: The principal of the loan.
+    :param rate: The initial annual rate as a percentage.
+    :param term: The term of the loan in months.
+    :param payment: The initial monthly payment.
+    :param starts: The first month of every rate period, see reset_months.
+    :param rates: The annual rate of every period after the first, as a paths x resets array.
+    :return: A dict with the 'payment' of each path in each period and the 'total interest' of each path.
+    """
+    rates = np.asarray(rates, dtype=float)
+    paths = rates.shape[0]
+    rates = np.concatenate((np.full((paths, 1), float(rate)), rates), axis=1)
+    ends = np.append(starts[1:], term + 1)
+
+    balance = np.full(paths, float(principal))
+    current = np.full(paths, float(payment))
+    payments = np.empty_like(rates)
+    total_interest = np.zeros(paths)
+    for period, (start, end) in enumerate(zip(starts, ends)):
+        m_rate = rates[:, period] / 100 / 12
+        if period > 0:
+            changed = rates[:, period] != rates[:, period - 1]
+            current = np.where(changed, monthly_payment(balance, m_rate, term - start + 1), current)
+        remaining = segment_balance(balance, m_rate, current, end - start)
+        total_interest += remaining - balance + (end - start) * current
+        balance = remaining
+        payments[:, period] = current
+
+    return {
+        'payment': payments,
+        'total interest': total_interest
+    }
+
+
+def _simulate_chunk(seed, paths: int, params: dict) -> dict:
+    """
+    Internal worker that simulates and amortizes one chunk of rate paths. Defined at module level so it can run in a
+    process pool.
+    :param seed: The SeedSequence of the chunk.
+    :param paths: The number of paths in the chunk.
+    :param params: The loan and simulation parameters. See simulate_rate_paths.
+    :return: The result of amortize_rate_paths for the chunk.
+    """
+    starts = params.get('starts')
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(params.get('drift'), params.get('volatility'), (paths, len(starts) - 1))
+    index = np.maximum(params.get('index') + np.cumsum(steps, axis=1), 0)
+    rates = reset_rates(params.get('rate'), index, params.get('margin'), params.get('initial cap'),
+                        params.get('periodic cap'), params.get('lifetime cap'), params.get('rate floor'))
+    return amortize_rate_paths(params.get('principal'), params.get('rate'), params.get('term'),
+                               params.get('monthly payment'), starts, rates)
+
+
+def simulate_rate_paths(params: dict, paths: int = 1000, seed: int = 0, chunk_size: int = 250, workers: int = None,
+                        percentiles=(5, 25, 50, 75, 95)) -> dict:
+    """
+    Simulates an adjustable rate loan over many random index paths. The index takes a normally distributed step at
+    every reset and never goes below zero. Paths are generated and amortized in chunks spread over a process pool.
+    Every chunk draws from its own child of the seed, so the results depend only on the seed and the chunk size and
+    not on the number of workers.
+    :param params: The 'principal', 'rate', 'term', 'monthly payment', 'initial period', 'reset interval', 'margin',
+    'initial cap', 'periodic cap', 'lifetime cap' and 'rate floor' of the loan, the starting 'index' and the 'drift' and
+    'volatility' of the index per reset, all rates as percentages.
+    :param paths: The number of rate paths.
+    :param seed: The random seed.
+    :param chunk_size: The number of paths generated and amortized together.
+    :param workers: The number of worker processes. 1 runs the chunks in this process. Defaults to the CPU count.
+    :param percentiles: The percentiles of the bands.
+    :return: A dict with the 'percentiles', the monthly 'payment' bands as a percentiles x months array indexed by month
+    (month 0 is 0), and the 'total interest' and 'max payment' at each percentile.
+    """
+    term = int(params.get('term'))
+    params = dict(params, starts=reset_months(term, int(params.get('initial period')),
+                                              int(params.get('reset interval'))))
+    counts = [min(chunk_size, paths - start) for start in range(0, paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+
+    if workers == 1:
+        results = [_simulate_chunk(s, count, params) for s, count in zip(seeds, counts)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_simulate_chunk, seeds, counts, [params] * len(counts)))
+
+    payments = np.concatenate([result.get('payment') for result in results])
+    total_interest = np.concatenate([result.get('total interest') for result in results])
+    starts = params.get('starts')
+    lengths = np.diff(np.append(starts, term + 1))
+    monthly = np.zeros((len(percentiles), term + 1))
+    monthly[:, 1:] = np.repeat(np.percentile(payments, percentiles, axis=0), lengths, axis=1)
+
+    return {
+        'percentiles': list(percentiles),
+        'payment': monthly,
+        'total interest': np.percentile(total_interest, percentiles),
+        'max payment': np.percentile(payments.max(axis=1), percentiles)
+    }
+
+
+def offer_cost_curves(principal, value, rate, term, points, fees, pmi_rate, pmi_ltv: float = 78,
+                      months: int = None) -> dict:
+    """
+    Evaluates many loan offers for the same property at once. The cumulative cost of each offer is its points and
+    fees plus the interest and PMI paid through each month, calculated in closed form. PMI is charged when less than
+    20% is put down, until the balance reaches the PMI cancellation LTV of the property value.
+    :param principal: The amount borrowed.
+    :param value: The value of the property.
+    :param rate: The annual rate of each offer as a percentage.
+    :param term: The term of each offer in months.
+    :param points: The points of each offer, as a percentage of the principal.
+    :param fees: The closing fees of each offer.
+    :param pmi_rate: The annual PMI rate of each offer, as a percentage of the principal.
+    :param pmi_ltv: The loan to value percentage at which PMI is cancelled.
+    :param months: Optional. The number of months of the cost curves. Defaults to the longest term.
+    :return: A dict of per offer arrays for 'monthly payment', 'upfront', 'total interest', 'pmi', 'pmi months' and
+    'total cost', and the offers x months 'cost' curves.
+    """
+    rate, term, points, fees, pmi_rate = np.broadcast_arrays(*(np.asarray(v, dtype=float)
+                                                               for v in (rate, term, points, fees, pmi_rate)))
+    m_rate = monthly_rate(rate)
+    payment = monthly_payment(principal, m_rate, term)
+    upfront = round_cents(principal * points / 100 + fees)
+
+    pmi = np.zeros_like(rate)
+    if round(1 - principal / value, 2) < 0.2:
+        pmi = round_cents(principal * pmi_rate / 100 / 12)
+    pmi_months = np.minimum(months_to_balance(principal, m_rate, payment, value * pmi_ltv / 100), term)
+    pmi_months = np.where(pmi > 0, pmi_months, 0)
+
+    if months is None:
+        months = int(term.max()) if term.size > 0 else 0
+    month = np.minimum(np.arange(months + 1)[None, :], term[:, None])
+    interest = segment_balance(principal, m_rate[:, None], payment[:, None], month) - principal + month * payment[:, None]
+    cost = upfront[:, None] + interest + pmi[:, None] * np.minimum(month, pmi_months[:, None])
+    total_interest = round_cents(payment * term - principal)
+
+    return {
+        'monthly payment': payment,
+        'upfront': upfront,
+        'total interest': total_interest,
+        'pmi': pmi,
+        'pmi months': pmi_months.astype(int),
+        'total cost': round_cents(upfront + total_interest + pmi * pmi_months),
+        'cost': cost
+    }
+
+
+def _rank_offer_chunk(params: dict) -> dict:
+    """
+    Internal worker that evaluates one chunk of offers and finds the month each one breaks even with the baseline
+    offer. Defined at module level so it can run in a process pool.
+    :param params: The offer_cost_curves arguments and the 'baseline' cost curve.
+    :return: The offer_cost_curves results without the curves, and the 'break even' month of each offer, or -1.
+    """
+    baseline = params.pop('baseline')
+    result = offer_cost_curves(months=len(baseline) - 1, **params)
+    cheaper = result.pop('cost') <= baseline[None, :] + 0.005
+    break_even = np.where(cheaper.any(axis=1), cheaper.argmax(axis=1), -1)
+    result.update({'break even': break_even})
+    return result
+
+
+def rank_offers(principal, value, offers: list, pmi_ltv: float = 78, chunk_size: int = 500,
+                workers: int = None) -> list:
+    """
+    Ranks loan offers for the same property by total cost, break-even month and monthly payment. The break-even month
+    is the first month in which an offer's cumulative cost is no more than that of the offer with the lowest upfront
+    cost. Offers are evaluated in chunks, and sets larger than one chunk are spread over a process pool.
+    :param principal: The amount borrowed.
+    :param value: The value of the property.
+    :param offers: A list of Offer objects.
+    :param pmi_ltv: The loan to value percentage at which PMI is cancelled.
+    :param chunk_size: The number of offers evaluated together.
+    :param workers: The number of worker processes. 1 evaluates every chunk in this process.
+    :return: A list of dicts with the results of each offer, ranked.
+    """
+    if len(offers) == 0:
+        return []
+    columns = {
+        'rate': [float(o.rate) for o in offers],
+        'term': [int(o.term) for o in offers],
+        'points': [float(o.points) for o in offers],
+        'fees': [float(o.fees) for o in offers],
+        'pmi_rate': [float(o.pmi_rate) for o in offers]
+    }
+    months = max(columns.get('term'))
+    upfront = np.asarray(columns.get('points')) * principal / 100 + np.asarray(columns.get('fees'))
+    base = int(np.lexsort((columns.get('rate'), upfront))[0])
+    baseline = offer_cost_curves(principal, value, months=months, pmi_ltv=pmi_ltv,
+                                 **{key: [column[base]] for key, column in columns.items()}).get('cost')[0]
+
+    chunks = [dict({key: column[start:start + chunk_size] for key, column in columns.items()},
+                   principal=principal, value=value, pmi_ltv=pmi_ltv, baseline=baseline)
+              for start in range(0, len(offers), chunk_size)]
+    if workers == 1 or len(chunks) == 1:
+        results = [_rank_offer_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_rank_offer_chunk, chunks))
+    result = {key: np.concatenate([r.get(key) for r in results]) for key in results[0].keys()}
+
+    ranking = []
+    for i, offer in enumerate(offers):
+        break_even = int(result.get('break even')[i])
+        ranking.append({
+            'offer': offer,
+            'monthly payment': float(result.get('monthly payment')[i]),
+            'upfront': float(result.get('upfront')[i]),
+            'total interest': float(result.get('total interest')[i]),
+            'pmi months': int(result.get('pmi months')[i]),
+            'total cost': float(result.get('total cost')[i]),
+            'break even': break_even if break_even >= 0 else None
+        })
+    ranking.sort(key=lambda r: (r.get('total cost'), months + 1 if r.get('break even') is None else r.get('break even'),
+                                r.get('monthly payment')))
+    return ranking
+
+
+def refinance_grid(balance, interest, months, rate, term, points, fees) -> dict:
+    """
+    Evaluates refinancing an existing loan into each of many offers at each of many future months. The original loan
+    is not re-amortized: its balance curve gives the amount refinanced and its cumulative interest curve gives the
+    interest a refinance avoids. The new loans are amortized in closed form over every remaining month at once.
+    :param balance: The balance of the original loan after each month, indexed by month.
+    :param interest: The interest of the original loan paid in each month, indexed by month.
+    :param months: The months after which the loan is refinanced.
+    :param rate: The annual rate of each offer as a percentage.
+    :param term: The term of each offer in months.
+    :param points: The points of each offer, as a percentage of the amount refinanced.
+    :param fees: The closing fees of each offer.
+    :return: A dict of offers x months arrays for the new 'monthly payment', the 'upfront' cost, the 'break even'
+    month counted from the refinance (-1 if it never breaks even) and the 'lifetime savings' in interest and costs.
+    """
+    balance = np.asarray(balance, dtype=float)
+    cumulative = np.cumsum(np.asarray(interest, dtype=float))
+    last = len(cumulative) - 1
+    months = np.asarray(months, dtype=int)
+    rate, term, points, fees = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (rate, term, points, fees)))
+
+    principal = balance[months]
+    shape = (len(rate), len(months))
+    payments = np.zeros(shape)
+    upfront = np.zeros(shape)
+    break_even = np.full(shape, -1)
+    savings = np.zeros(shape)
+    for i in range(len(rate)):
+        m_rate = rate[i] / 100 / 12
+        payment = monthly_payment(principal, m_rate, term[i])
+        cost = round_cents(principal * points[i] / 100 + fees[i])
+
+        elapsed = np.arange(1, last + 1)[None, :]
+        new_months = np.minimum(elapsed, term[i])
+        new_interest = segment_balance(principal[:, None], m_rate, payment[:, None], new_months) - \
+            principal[:, None] + new_months * payment[:, None]
+        old_interest = cumulative[np.minimum(months[:, None] + elapsed, last)] - cumulative[months][:, None]
+        saved = old_interest - new_interest - cost[:, None] >= -0.005
+
+        payments[i] = payment
+        upfront[i] = cost
+        break_even[i] = np.where(saved.any(axis=1), saved.argmax(axis=1) + 1, -1)
+        savings[i] = round_cents(cumulative[last] - cumulative[months] - (payment * term[i] - principal) - cost)
+
+    return {
+        'monthly payment': payments,
+        'upfront': upfront,
+        'break even': break_even,
+        'lifetime savings': savings
+    }
+
+
+def simulate_debt_payoff(balance, m_rate, minimum, budget, order, term=None, max_months: int = 1200,
+                         keep_schedule: bool = True) -> dict:
+    """
+    Simulates paying off several debts together from one monthly budget. Every debt receives its minimum payment and
+    the rest of the budget goes to the first unpaid debt in the priority order, so a payment freed by a payoff rolls
+    into the next debt. The simulation is event driven: between payoffs every payment is constant, so the debts are
+    advanced in closed form straight to the next payoff. The freed payment starts the month after the payoff.
+    :param balance: The balance of each debt.
+    :param m_rate: The monthly rate of each debt as a fraction.
+    :param minimum: The minimum monthly payment of each debt.
+    :param budget: The total monthly budget for the debts.
+    :param order: The indices of the debts in priority order.
+    :param term: Optional. The term of each debt in months. A debt still open at the end of its term is paid off with
+    a final payment of the remaining balance, the way a rounded scheduled payment leaves a few cents for the last month.
+    :param max_months: The longest the simulation runs.
+    :param keep_schedule: Whether the month by month balances and payments are kept in the result.
+    :return: A dict with the 'payoff month' (0 if unpaid) and 'interest' of each debt, the 'total interest', the
+    'last month' and, when kept, the debts x months 'balance' and the combined 'payment' per month.
+    """
+    balance = np.array(balance, dtype=float)
+    m_rate = np.asarray(m_rate, dtype=float)
+    minimum = np.asarray(minimum, dtype=float)
+    initial = balance.copy()
+    order = list(order)
+    active = balance > 0
+    if budget < minimum[active].sum() - 0.005:
+        raise ValueError(f'The budget {budget} does not cover the minimum payments of {minimum[active].sum():.2f}')
+
+    payoff = np.zeros(len(balance), dtype=int)
+    segments = []
+    month = 0
+    while active.any() and month < max_months:
+        payment = np.where(active, minimum, 0)
+        target = next(i for i in order if active[i])
+        payment[target] += budget - payment.sum()
+
+        needed = np.where(active, months_to_payoff(balance, m_rate, payment), np.inf)
+        if term is not None:
+            needed = np.minimum(needed, np.maximum(np.asarray(term) - month, 1))
+        months = int(min(needed.min(), max_months - month))
+        segments.append((month, balance, payment, months))
+
+        done = active & (needed <= months)
+        balance = np.where(done, 0, segment_balance(balance, m_rate, payment, months))
+        payoff[done] = month + months
+        active &= ~done
+        month += months
+
+    last_month = month
+    curve = np.zeros((len(balance), last_month + 1))
+    curve[:, 0] = initial
+    for start, start_balance, payment, months in segments:
+        elapsed = np.arange(1, months + 1)[None, :]
+        curve[:, start + 1:start + months + 1] = segment_balance(start_balance[:, None], m_rate[:, None],
+                                                                 payment[:, None], elapsed)
+    curve = np.maximum(curve, 0)
+    curve[np.arange(last_month + 1)[None, :] >= np.where(payoff > 0, payoff, last_month + 1)[:, None]] = 0
+    curve[:, 1:] = np.where(curve[:, :-1] > 0, curve[:, 1:], 0)
+    interest = np.zeros_like(curve)
+    interest[:, 1:] = curve[:, :-1] * m_rate[:, None]
+    paid = np.zeros_like(curve)
+    paid[:, 1:] = curve[:, :-1] + interest[:, 1:] - curve[:, 1:]
+
+    result = {
+        'payoff month': payoff,
+        'interest': round_cents(interest.sum(axis=1)),
+        'total interest': round(float(interest.sum()), 2),
+        'last month': last_month
+    }
+    if keep_schedule:
+        result.update({
+            'balance': curve,
+            'payment': paid.sum(axis=0)
+        })
+    return result
+
+
+def household_payoff(loans: list, budgets, strategy: str = 'avalanche', priority: list = None, **kwargs) -> list:
+    """
+    Simulates paying off a household's loans together at each of several budget levels. See simulate_debt_payoff.
+    :param loans: The Loan objects.
+    :param budgets: The monthly budgets to simulate.
+    :param strategy: 'avalanche' pays the highest rate first, 'snowball' pays the smallest balance first and 'custom'
+    follows the priority list.
+    :param priority: The loans in priority order, for the 'custom' strategy.
+    :return: A list with the simulation result of each budget. Each result also holds its 'budget' and the 'order' of
+    the loans.
+    """
+    balance = np.array([float(loan.data('principal')) for loan in loans])
+    rate = np.array([float(loan.data('rate')) for loan in loans])
+    minimum = np.array([float(loan.data('monthly payment')) for loan in loans])
+    term = np.array([int(loan.data('term')) for loan in loans])
+
+    if strategy == 'avalanche':
+        order = np.argsort(-rate, kind='stable').tolist()
+    elif strategy == 'snowball':
+        order = np.argsort(balance, kind='stable').tolist()
+    elif strategy == 'custom':
+        if priority is None:
+            raise ValueError('The custom payoff strategy needs a priority list')
+        order = [loans.index(loan) for loan in priority]
+        order += [i for i in range(len(loans)) if i not in order]
+    else:
+        raise ValueError(f'Unknown payoff strategy: {strategy}')
+
+    results = []
+    for budget in budgets:
+        result = simulate_debt_payoff(balance, monthly_rate(rate), minimum, budget, order, term, **kwargs)
+        result.update({
+            'budget': budget,
+            'order': [loans[i] for i in order]
+        })
+        results.append(result)
+    return results
+
+
+def year_fraction(start, end, basis: str = 'actual/365') -> float:
+    """
+    Returns the fraction of a year between two dates under a day count convention, from the day counts alone.
+    :param start: The start date.
+    :param end: The end date.
+    :param basis: 'actual/365' divides the days by 365. 'actual/actual' divides the days falling in each calendar year
+    by the length of that year.
+    :return: The year fraction.
+    """
+    if basis == 'actual/365':
+        return (end.toordinal() - start.toordinal()) / 365
+    if basis == 'actual/actual':
+        fraction = 0
+        for year in range(start.year, end.year + 1):
+            first = max(start.toordinal(), date(year, 1, 1).toordinal())
+            last = min(end.toordinal(), date(year + 1, 1, 1).toordinal())
+            length = 366 if calendar.isleap(year) else 365
+            fraction += max(last - first, 0) / length
+        return fraction
+    raise ValueError(f'Unknown day count basis: {basis}')
+
+
+def add_months(when, months: int, day: int = None):
+    """
+    Returns the date a number of months after a date, on the given day of the month or the last day of shorter months.
+    :param when: The date.
+    :param months: The number of months to add.
+    :param day: Optional. The day of the month. Defaults to the day of when.
+    :return: The new date.
+    """
+    month = when.month - 1 + months
+    year = when.year + month // 12
+    month = month % 12 + 1
+    day = when.day if day is None else day
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
@@ -0,0 +1,67 @@
+# Author: Hobs Towler
+# Date: 10/18/2026
+# Description: Measures the throughput of the amortization engines.
+import contextlib
+import io
+import sys
+import time
+
+import amortization
+from loans import Loan
+from misc import ExtraPayment
+
+
+def time_engine(loan: Loan, engine: str, extra_payments: bool, repeat: int) -> float:
+    """
+    Times the schedule calculation of a single loan with the given engine. The schedule cache is bypassed so every
+    repetition calculates the full schedule.
+    :param loan: The loan to amortize.
+    :param engine: The amortization engine.
+    :param extra_payments: Whether the loan's extra payments are applied.
+    :param repeat: The number of schedules to calculate.
+    :return: The number of schedules calculated per second.
+    """
+    calculate = {
+        'python': loan._amortization_rows,
+        'cents': loan._amortization_cents,
+        'numpy': loan._amortization_arrays
+    }.get(engine)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            loan.invalidate()
+            calculate(extra_payments)
+    return repeat / (time.perf_counter() - start)
+
+
+def time_batch(loan: Loan, extra_payments: bool, size: int) -> float:
+    """
+    Times the numpy engine amortizing a batch of copies of a loan at once.
+    :param loan: The loan to amortize.
+    :param extra_payments: Whether the loan's extra payments are applied.
+    :param size: The number of loans in the batch.
+    :return: The number of schedules calculated per second.
+    """
+    start = time.perf_counter()
+    amortization.amortize_portfolio([loan] * size, extra_payments)
+    return size / (time.perf_counter() - start)
+
+
+def main(repeat: int = 200):
+    loan = Loan(None, 'benchmark loan')
+    loan.add_extra_payment(ExtraPayment(5, 24, 1000))
+    loan.add_extra_payment(ExtraPayment(60, 24, 1000))
+
+    print(f'{"engine":<10}{"extra":<8}{"schedules/sec":>15}')
+    for engine in ('python', 'cents', 'numpy'):
+        for extra_payments in (False, True):
+            rate = time_engine(loan, engine, extra_payments, repeat)
+            print(f'{engine:<10}{str(extra_payments):<8}{rate:>15,.0f}')
+    for extra_payments in (False, True):
+        rate = time_batch(loan, extra_payments, repeat * 10)
+        print(f'{"batch":<10}{str(extra_payments):<8}{rate:>15,.0f}')
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -160,6 +160,7 @@ class FinanceObj:
         elif isinstance(f_var, DoubleVar):
             print("it's a float")
         self._data.update({key: val})
+        self.invalidate()
         self._app.populate_editable(self)
 
     def copy(self):
@@ -176,12 +177,19 @@ class FinanceObj:
         """
         for key in self._form_vars:
             self._data.update({key: self._form_vars.get(key).get()})
+        self.invalidate()
         self._app.save_fin_obj(self)
 
         self._app.populate_list(refresh=True)
         self._app.populate_detail(self)
         self._app.populate_info(f'Successfully saved "{self.data("name")}"!')
 
+    def invalidate(self) -> None:
+        """
+        Called after the data dict is saved. Child classes drop any values they derived from the old data.
+        """
+        pass
+
     def refresh_detail(self, *args):
         self._app.populate_detail(self)
 
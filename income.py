@@ -2,9 +2,14 @@
 # Date: 12/1/2021
 # Description:
 
+import functools
 import locale
+from bisect import bisect_right
 from tkinter import *
 
+import numpy as np
+
+import numeric
 from financeObj import FinanceObj
 from misc import *
 
@@ -133,6 +138,7 @@ class Expenses(FinanceObj):
             'label': ""
         })
         self._expenses = []
+        self._version = 0
 
     @staticmethod
     def __str__():
@@ -172,6 +178,37 @@ class Expenses(FinanceObj):
         """
         return self._expenses
 
+    def get_version(self) -> int:
+        """
+        Returns a counter that changes whenever an expense is added or removed.
+        :return: The version of the expenses.
+        """
+        return self._version
+
+    def add_expense(self, expense: Expense) -> bool:
+        """
+        Adds an Expense if it is not already in the list.
+        :param expense: The Expense to add.
+        :return: True if the expense was added.
+        """
+        if expense in self._expenses:
+            return False
+        self._expenses.append(expense)
+        self._version += 1
+        return True
+
+    def rem_expense(self, expense: Expense) -> bool:
+        """
+        Removes an Expense if it exists.
+        :param expense: The Expense to remove.
+        :return: True if there was an expense to be removed.
+        """
+        if expense in self._expenses:
+            self._expenses.remove(expense)
+            self._version += 1
+            return True
+        return False
+
     def get_total(self) -> float:
         """
         Returns the total of all expenses.
@@ -266,6 +303,9 @@ class TaxBracket(FinanceObj):
     def __init__(self, app, name: str, desc: str = "") -> None:
         super().__init__(app, name, desc)
         self._brackets = []
+        self._version = 0
+        self._table = None
+        self._function = None
         self._data.update({
             'state': '',
             'locality': '',
@@ -292,6 +332,7 @@ class TaxBracket(FinanceObj):
             return
 
         self._brackets = []
+        self._version += 1
         for b in brackets:
             if len(b) == 2:
                 self.add_range(b[0], b[1])
@@ -299,6 +340,38 @@ class TaxBracket(FinanceObj):
     def get_brackets(self) -> list:
         return self._brackets
 
+    def get_version(self) -> int:
+        """
+        Returns a counter that changes whenever the brackets change.
+        :return: The version of the brackets.
+        """
+        return self._version
+
+    def add_bracket(self, bracket: Bracket) -> bool:
+        """
+        Adds a Bracket and keeps the brackets sorted by upper range.
+        :param bracket: The Bracket to add.
+        :return: True if the bracket was added.
+        """
+        if bracket in self._brackets:
+            return False
+        self._brackets.append(bracket)
+        self._brackets.sort(key=lambda b: b.upper)
+        self._version += 1
+        return True
+
+    def rem_bracket(self, bracket: Bracket) -> bool:
+        """
+        Removes a Bracket if it exists.
+        :param bracket: The Bracket to remove.
+        :return: True if there was a bracket to be removed.
+        """
+        if bracket in self._brackets:
+            self._brackets.remove(bracket)
+            self._version += 1
+            return True
+        return False
+
     def add_range(self, upper_range: (int, float), rate: (int, float)):
         """
         Adds a range and associated rate to the tax bracket. Method will check to see if the range is already in the
@@ -314,10 +387,11 @@ class TaxBracket(FinanceObj):
             return
         index = self._get_range(upper_range)
         if index is None:
-            self._brackets.append([upper_range, rate / 100])
-            self._brackets.sort()
+            self._brackets.append(Bracket(rate, upper_range))
+            self._brackets.sort(key=lambda b: b.upper)
         else:
-            self._brackets[index] = [upper_range, rate / 100]
+            self._brackets[index] = Bracket(rate, upper_range)
+        self._version += 1
 
     def rem_range(self, upper_range: (int, float)):
         """
@@ -325,12 +399,10 @@ class TaxBracket(FinanceObj):
         :param upper_range: The range to be removed.
         :return: True if there was a bracket to be removed.
         """
-        index = None
-        for r in self._brackets:
-            if r[0] == upper_range:
-                index = self._brackets.index(r)
+        index = self._get_range(upper_range)
         if index is not None:
             del self._brackets[index]
+            self._version += 1
             return True
         return False
 
@@ -341,52 +413,117 @@ class TaxBracket(FinanceObj):
         :return: the index of the range if it already exists in the list.
         """
         for r in self._brackets:
-            if r[0] == upper_range:
+            if r.upper == upper_range:
                 return self._brackets.index(r)
         return None
 
-    def calculate_taxed_amount(self, income) -> tuple:
+    def compile(self) -> tuple:
         """
-        Calculates the total taxed amount and the effective tax rate for a given income.
-        :param income: The yearly income to be taxed
-        :return: A list of the taxed amount and the effective rate.
+        Compiles the brackets into a table of sorted upper ranges, the lower range and rate of each bracket and the
+        cumulative tax owed at each upper range. The table is cached until the brackets change.
+        :return: The (uppers, lowers, rates, cumulative tax) lists.
         """
-        print('income', income)
-        if len(self._brackets) == 0:
-            return 0
+        if self._table is not None and self._table[0] == self._version:
+            return self._table[1]
 
+        uppers, lowers, rates, cumulative = [], [], [], []
         taxed_amount = 0
         for i in range(0, len(self._brackets)):
-            print("rate:", self._brackets[i].rate)
-            print("upper:", self._brackets[i].upper)
+            bracket = self._brackets[i]
+            lower = 0 if i == 0 else self._brackets[i - 1].upper + 0.01
             if i == 0:
-                if income >= self._brackets[i].upper:
-                    amount = (self._brackets[i].upper * self._brackets[i].rate / 100)
-                    print(amount)
-                    taxed_amount += amount
-                else:
-                    amount = income * self._brackets[i].rate / 100
-                    print(amount)
-                    taxed_amount += amount
+                taxed_amount += bracket.upper * bracket.rate / 100
             else:
-                lower_range = self._brackets[i - 1].upper + 0.01
-                upper_range = self._brackets[i].upper
-                if income >= upper_range:
-                    amount = (upper_range - lower_range) * self._brackets[i].rate / 100
-                    print(amount)
-                    taxed_amount += amount
-                elif income < upper_range and income > lower_range:
-                    amount = (income - lower_range) * self._brackets[i].rate / 100
-                    print('upper:', upper_range, 'lower:', lower_range)
-                    print(amount)
-                    taxed_amount += amount
+                taxed_amount += (bracket.upper - lower) * bracket.rate / 100
+            uppers.append(bracket.upper)
+            lowers.append(lower)
+            rates.append(bracket.rate)
+            cumulative.append(taxed_amount)
+
+        table = (uppers, lowers, rates, cumulative)
+        self._table = (self._version, table)
+        return table
+
+    def get_function(self) -> numeric.PiecewiseLinear:
+        """
+        Returns the tax owed as a piecewise-linear function of income, built from the compiled table. Every bracket
+        starts a cent above the one before it, so the tax holds flat across that cent. The function is cached until the
+        brackets change.
+        :return: The tax function.
+        """
+        if self._function is not None and self._function[0] == self._version:
+            return self._function[1]
+
+        if len(self._brackets) == 0:
+            function = numeric.PiecewiseLinear.linear(0)
+        else:
+            uppers, lowers, rates, cumulative = self.compile()
+            xs, ys = [0], [0]
+            for i in range(0, len(uppers)):
+                if i > 0:
+                    xs.append(lowers[i])
+                    ys.append(cumulative[i - 1])
+                xs.append(uppers[i])
+                ys.append(cumulative[i])
+            function = numeric.PiecewiseLinear(xs, ys, rates[0] / 100, 0)
+
+        self._function = (self._version, function)
+        return function
+
+    def calculate_taxed_amount(self, income) -> tuple:
+        """
+        Calculates the total taxed amount and the effective tax rate for a given income. The bracket containing the
+        income is found with a binary search of the compiled table, and the tax is the cumulative tax below it plus the
+        tax on the income within it.
+        :param income: The yearly income to be taxed
+        :return: A list of the taxed amount and the effective rate.
+        """
+        if len(self._brackets) == 0:
+            return 0, 0
+
+        uppers, lowers, rates, cumulative = self.compile()
+        i = bisect_right(uppers, income)
+        if i == len(uppers):
+            taxed_amount = cumulative[-1]
+        elif i == 0:
+            taxed_amount = income * rates[0] / 100
+        elif income > lowers[i]:
+            taxed_amount = cumulative[i - 1] + (income - lowers[i]) * rates[i] / 100
+        else:
+            taxed_amount = cumulative[i - 1]
 
         taxed_amount = round(taxed_amount, 2)
-        print(taxed_amount)
+        if income == 0:
+            return taxed_amount, 0
         effective_rate = round(100 * taxed_amount / income, 4)
 
         return taxed_amount, effective_rate
 
+    def calculate_taxed_amounts(self, incomes) -> tuple:
+        """
+        Calculates the taxed amounts and effective tax rates for an array of incomes at once. The brackets are found
+        with a searchsorted over the compiled table and the arithmetic matches calculate_taxed_amount, so every result
+        is the same to the cent.
+        :param incomes: The yearly incomes to be taxed.
+        :return: Arrays of the taxed amounts and the effective rates.
+        """
+        incomes = np.asarray(incomes, dtype=float)
+        if len(self._brackets) == 0:
+            return np.zeros_like(incomes), np.zeros_like(incomes)
+
+        uppers, lowers, rates, cumulative = (np.asarray(column, dtype=float) for column in self.compile())
+        i = np.searchsorted(uppers, incomes, side='right')
+        inside = np.minimum(i, len(uppers) - 1)
+        below = np.concatenate(([0], cumulative))[i]
+        partial = np.where(incomes > lowers[inside], (incomes - lowers[inside]) * rates[inside] / 100, 0)
+        partial = np.where(i == 0, incomes * rates[0] / 100, partial)
+        taxed_amounts = np.where(i == len(uppers), cumulative[-1], np.where(i == 0, partial, below + partial))
+
+        taxed_amounts = numeric.round_cents(taxed_amounts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            effective_rates = np.where(incomes == 0, 0, numeric.round_to(100 * taxed_amounts / incomes, 4))
+        return taxed_amounts, effective_rates
+
     def launch_bracket_editor(self):
         root = self._app.get_root()
         BracketWindow(root, self._app, self)
@@ -458,6 +595,19 @@ class TaxBracket(FinanceObj):
             index = self.tk_list_pair(f'{bracket.rate}%', bounds, bracket_panel, index)
 
 
+def memoized(method):
+    """
+    Caches the result of a Job method until one of the inputs it read changes. See Job.get_cached.
+    :param method: The method to cache.
+    :return: The caching method.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        return self.get_cached(key, lambda: method(self, *args, **kwargs))
+    return wrapper
+
+
 class Job(FinanceObj):
     """Represents a job."""
 
@@ -486,6 +636,8 @@ class Job(FinanceObj):
         self._taxes = []
         self._pre_tax_deductions = Expenses(app, 'pre tax')
         self._post_tax_deductions = Expenses(app, 'post tax')
+        self._memo = {}
+        self._reads = []
 
         self._valid_pay_frequency = ['Weekly', 'Bi-Weekly', 'Semimonthly', 'Monthly', 'Quarterly', 'Annually']
         self._num_pay_periods = {
@@ -515,6 +667,91 @@ class Job(FinanceObj):
         """
         pass
 
+    def data(self, key: str) -> (float, int, str):
+        """
+        Gets the value from the data dict and records the key as an input of any cached value being calculated.
+        :param key: the key value for the data.
+        :return: The value for the given key.
+        """
+        self._record(('data', key))
+        return super().data(key)
+
+    def assume(self, key: str) -> (float, int, str):
+        """
+        Gets the value from the assumptions dict and records the key as an input of any cached value being calculated.
+        :param key: the key value for the assumption.
+        :return: The value of the assumption for given key.
+        """
+        self._record(('assume', key))
+        return super().assume(key)
+
+    def get_taxes(self) -> list:
+        """
+        Returns the tax brackets withheld from the job and records them as an input of any cached value being
+        calculated.
+        :return: The tax brackets.
+        """
+        self._record(('taxes', None))
+        return self._taxes
+
+    def get_deduction_total(self, deductions: Expenses) -> float:
+        """
+        Returns the total of the pre or post tax deductions and records them as an input of any cached value being
+        calculated.
+        :param deductions: The pre or post tax deductions.
+        :return: The total of the deductions.
+        """
+        name = '_pre_tax_deductions' if deductions is self._pre_tax_deductions else '_post_tax_deductions'
+        self._record(('deductions', name))
+        return deductions.get_total()
+
+    def get_cached(self, key, calculate):
+        """
+        Returns a derived value, calculating it only when the inputs it read last time have changed. The inputs are
+        the data and assumption keys, the attached tax brackets with their versions and the versions of the
+        deductions. A cached value read while calculating another value passes its inputs on to that value.
+        :param key: The key of the value.
+        :param calculate: Calculates the value when the cache is out of date.
+        :return: The value.
+        """
+        entry = self._memo.get(key)
+        if entry is None or any(self._get_input(i) != value for i, value in entry[0].items()):
+            self._reads.append({})
+            try:
+                value = calculate()
+            finally:
+                inputs = self._reads.pop()
+            entry = (inputs, value)
+            self._memo[key] = entry
+        if self._reads:
+            self._reads[-1].update(entry[0])
+        return entry[1]
+
+    def _record(self, source: tuple) -> None:
+        """
+        Records an input and its current value for the value being calculated, if any.
+        :param source: The input, a tuple of its kind and key.
+        """
+        if self._reads:
+            self._reads[-1][source] = self._get_input(source)
+
+    def _get_input(self, source: tuple):
+        """
+        Returns the current value of an input. Tax brackets are compared by identity, version and type, deductions by
+        version.
+        :param source: The input, a tuple of its kind and key.
+        :return: The value of the input.
+        """
+        kind, key = source
+        if kind == 'data':
+            return self._data.get(key)
+        if kind == 'assume':
+            return self._assumptions.get(key)
+        if kind == 'taxes':
+            return tuple((tax, tax.get_version(), tax.data('type')) for tax in self._taxes)
+        return getattr(self, key).get_version()
+
+    @memoized
     def get_annual_income(self) -> (int, float):
         """
         Returns the annual income based on base salary and pay periods.
@@ -537,6 +774,7 @@ class Job(FinanceObj):
         income = self.get_annual_income() if annual else self.data('income')
         return self.data('roth rate') * income / 100
 
+    @memoized
     def get_pretax_income(self, annual: bool = True) -> float:
         """
         Returns the net amount before taxes and post tax deductions are applied.
@@ -545,10 +783,11 @@ class Job(FinanceObj):
         income = self.get_annual_income()
         total_deduction = 0
         total_deduction += self.get_annual_401k_amount()
-        total_deduction += self._pre_tax_deductions.get_total()
+        total_deduction += self.get_deduction_total(self._pre_tax_deductions)
 
         return income - total_deduction
 
+    @memoized
     def get_annual_post_tax_income(self) -> (int, float):
         """
         Returns the net annual amount after taxes and deductions.
@@ -562,7 +801,7 @@ class Job(FinanceObj):
         taxed_amount += federal
         taxed_amount += state
         taxed_amount += local
-        total_deduction += self._post_tax_deductions.get_total()
+        total_deduction += self.get_deduction_total(self._post_tax_deductions)
 
         taxed_amount += self.get_annual_social_security()
         taxed_amount += self.get_annual_medicare()
@@ -570,13 +809,14 @@ class Job(FinanceObj):
 
         return income - taxed_amount - total_deduction
 
+    @memoized
     def get_annual_taxed_amounts(self):
         income = self.get_annual_income()
         federal = 0
         state = 0
         local = 0
 
-        for tax in self._taxes:
+        for tax in self.get_taxes():
             amount, rate = tax.calculate_taxed_amount(income)
             type = tax.data('type')
             if type == 'Federal':
@@ -589,6 +829,7 @@ class Job(FinanceObj):
         return federal, state, local
 
     # TODO calculate employer responsibility
+    @memoized
     def get_annual_social_security(self):
         cap = self.assume('social security cap')
         rate = self.assume('social security rate') / 100
@@ -600,11 +841,71 @@ class Job(FinanceObj):
             return round((rate * cap) / pay_periods, 2)
 
     # TODO calculate employer responsibility
+    @memoized
     def get_annual_medicare(self):
         rate = self.assume('medicare tax rate') / 100
         income = self.data('income')
         return round(rate * income, 2)
 
+    @memoized
+    def get_tax_function(self) -> numeric.PiecewiseLinear:
+        """
+        Merges every tax withheld from the job into one piecewise-linear function of annual gross income: each tax
+        bracket, social security up to its cap and medicare. Social security and medicare are taken on a single pay
+        period, the same way get_annual_social_security and get_annual_medicare calculate them.
+        :return: The merged tax function.
+        """
+        pay_periods = self.get_pay_periods()
+        social_security = numeric.PiecewiseLinear.linear(self.assume('social security rate') / 100 / pay_periods)
+        medicare = numeric.PiecewiseLinear.linear(self.assume('medicare tax rate') / 100 / pay_periods)
+
+        function = social_security.cap(self.assume('social security cap')) + medicare
+        for tax in self.get_taxes():
+            function += tax.get_function()
+        return function
+
+    @memoized
+    def get_net_income_function(self) -> numeric.PiecewiseLinear:
+        """
+        Returns the net annual income as a piecewise-linear function of annual gross income, after retirement
+        contributions, deductions and the merged tax function. The taxes are not rounded to the cent one by one, so a
+        result can differ from get_annual_post_tax_income by up to half a cent per tax.
+        :return: The net income function.
+        """
+        retirement = (self.data('401k rate') + self.data('roth rate')) / 100
+        deductions = self.get_deduction_total(self._pre_tax_deductions)
+        deductions += self.get_deduction_total(self._post_tax_deductions)
+        return numeric.PiecewiseLinear.linear(1 - retirement, -deductions) - self.get_tax_function()
+
+    def get_annual_post_tax_incomes(self, incomes):
+        """
+        Calculates the net annual income for many annual gross incomes at once with the merged net income function.
+        :param incomes: A scalar or array of annual gross incomes.
+        :return: The net annual incomes.
+        """
+        return self.get_net_income_function()(incomes)
+
+    def get_required_income(self, net, annual: bool = True) -> float:
+        """
+        Solves for the gross income that leaves a target net income. See get_required_incomes.
+        :param net: The target net income.
+        :param annual: True if the target and the result are annual amounts, False if they are per pay period.
+        :return: The gross income.
+        """
+        return float(self.get_required_incomes([net], annual)[0])
+
+    def get_required_incomes(self, nets, annual: bool = True):
+        """
+        Solves for the gross incomes that leave an array of target net incomes by inverting the merged net income
+        function, one binary search over its breakpoints per target.
+        :param nets: The target net incomes.
+        :param annual: True if the targets and the results are annual amounts, False if they are per pay period.
+        :return: The gross incomes.
+        """
+        pay_periods = 1 if annual else self.get_pay_periods()
+        nets = np.asarray(nets, dtype=float) * pay_periods
+        return self.get_net_income_function().inverse(nets) / pay_periods
+
     def launch_deduction_selector(self, expense):
         root = self._app.get_root()
         ExpenseSelector(root, self._app, expense)
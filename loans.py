@@ -5,21 +5,32 @@ import locale
 import math
 import tkinter
 import tkinter as tk
-from datetime import date
+from datetime import date, datetime, timedelta
 from tkinter import W, E, LEFT, RIGHT, N, S, X, Y, BOTH, ttk, BOTTOM
 
+import numpy as np
 from matplotlib import pyplot
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
-from misc import ErrorBox, Style, ExtraPaymentWindow, ExtraPayment
+import amortization
+from misc import ErrorBox, Style, ExtraPaymentWindow, ExtraPayment, OfferComparisonWindow
 from financeObj import FinanceObj
 
 
 class Loan(FinanceObj):
+    schedule_cache = amortization.ScheduleCache(maxsize=128)
+    checkpoint_interval = 12
+    cents_rounding = 'half up'
+    array_engine = 'python'
+    payment_frequencies = {'Monthly': 12, 'Semimonthly': 24, 'Bi-Weekly': 26, 'Accelerated Bi-Weekly': 26}
+
     def __init__(self, app, name: str, desc: str = ""):
         super().__init__(app, name, desc)
         self._type = "Loan"
         self._extra_payments = []
+        self._extra_payment_vector = None
+        self._schedule_keys = set()
+        self._checkpoints = None
 
         self._data.update({
             "total": 240000,
@@ -32,6 +43,7 @@ class Loan(FinanceObj):
             "origination": date(2020, 1, 1),
             'first payment': date(2020, 2, 1),
             'monthly payment': 1200,
+            'payment frequency': 'Monthly',
             'loan company': 'Neighborhood Loan Company'
         })
         self.calc_principal()
@@ -45,17 +57,26 @@ class Loan(FinanceObj):
     def button_hover_message(cls):
         return f"Click to populate a list of {cls.__str__()} Loans."
 
-    def calc_m_interest(self, amount) -> float:
+    def calc_m_interest(self, amount, month: int = None) -> float:
         """
         Calculates the monthly interest for a given amount and month.
         To be called when calculating amortization schedule.
         :param amount: The principal remaining at the start of the period.
-        :param month: The month for which interest is to be calculated.
+        :param month: The month for which interest is to be calculated. The rate of a fixed rate loan is the same every
+        month.
         :return: The amount of interest accrued that month
         """
-        m_rate = float(self._data.get("rate")) / 100 / 12 # TODO make this work by month
+        m_rate = float(self._data.get("rate")) / 100 / 12
         return round(amount * m_rate, 2)
 
+    def rate_resets(self) -> dict:
+        """
+        Returns the months in which the rate of the loan changes and the payment is re-solved. A fixed rate loan never
+        resets.
+        :return: A dict of reset months to the new annual rate.
+        """
+        return {}
+
     def calc_principal(self) -> float:
         total = self.data('total')
         down = self.data('down payment')
@@ -80,74 +101,526 @@ class Loan(FinanceObj):
     def get_extra_payments(self) -> list:
         return self._extra_payments
 
+    def periods_per_year(self) -> int:
+        """
+        Returns the number of payments made per year under the loan's payment frequency. Frequencies a loan type does
+        not offer are paid monthly.
+        :return: 12, 24 or 26.
+        """
+        return self.payment_frequencies.get(self._data.get('payment frequency'), 12)
+
+    def period_count(self) -> int:
+        """
+        Returns the number of payment periods over the term of the loan.
+        :return: The number of payments.
+        """
+        return int(self._data.get("term")) * self.periods_per_year() // 12
+
+    def periodic_rate(self) -> float:
+        """
+        Returns the rate charged each payment period, so interest accrues between payments at any frequency.
+        :return: The periodic rate as a fraction.
+        """
+        return float(self._data.get("rate")) / 100 / self.periods_per_year()
+
+    def periodic_payment(self) -> float:
+        """
+        Returns the scheduled payment per payment period. Semimonthly and bi-weekly payments amortize the loan over the
+        same term at the periodic rate. Accelerated bi-weekly payments are half the monthly payment, which adds up to
+        one extra monthly payment a year.
+        :return: The payment per period.
+        """
+        periods = self.periods_per_year()
+        if periods == 12:
+            return self.data('monthly payment')
+        if self._data.get('payment frequency') == 'Accelerated Bi-Weekly':
+            return round(self.data('monthly payment') / 2, 2)
+        return float(amortization.monthly_payment(self._data.get("principal"), self.periodic_rate(),
+                                                  self.period_count()))
+
+    def invalidate(self) -> None:
+        """
+        Drops the cached schedules and extra payment vector of this loan. Called whenever the loan's data is saved.
+        """
+        self.schedule_cache.discard(self._schedule_keys)
+        self._schedule_keys = set()
+        self._extra_payment_vector = None
+        self._checkpoints = None
+
+    def schedule_fingerprint(self, extra_payments=False, engine='python') -> tuple:
+        """
+        Returns a hashable fingerprint of everything the amortization schedule depends on.
+        :param extra_payments: Whether extra payments are applied to the schedule.
+        :param engine: The amortization engine.
+        :return: The fingerprint tuple.
+        """
+        extras = ()
+        if extra_payments:
+            extras = tuple((e.start, e.end, e.amount) for e in self._extra_payments)
+        return (type(self).__name__, engine, self.cents_rounding, self._data.get('principal'), self._data.get('rate'),
+                self._data.get('term'), self._data.get('monthly payment'), self._data.get('payment frequency'), extras)
+
+    def add_extra_payment(self, extra_payment: ExtraPayment) -> None:
+        """
+        Adds an extra payment to the loan and invalidates the cached extra payment vector.
+        :param extra_payment: The ExtraPayment to add.
+        """
+        self._extra_payments.append(extra_payment)
+        self._extra_payment_vector = None
+
+    def rem_extra_payment(self, extra_payment: ExtraPayment) -> bool:
+        """
+        Removes an extra payment from the loan if it exists and invalidates the cached extra payment vector.
+        :param extra_payment: The ExtraPayment to remove.
+        :return: True if there was an extra payment to be removed.
+        """
+        if extra_payment in self._extra_payments:
+            self._extra_payments.remove(extra_payment)
+            self._extra_payment_vector = None
+            return True
+        return False
+
+    def get_extra_payment_vector(self, term: int) -> np.ndarray:
+        """
+        Returns the total extra payment made in each month of the loan. The ExtraPayment ranges are compiled once with a
+        difference array and cached until the extra payments or the term change.
+        :param term: The number of months in the vector.
+        :return: The extra payment per month, indexed by month. Month 0 is always 0.
+        """
+        if self._extra_payment_vector is None or len(self._extra_payment_vector) != term + 1:
+            self._extra_payment_vector = amortization.extra_payment_matrix([self._extra_payments], term)[0]
+        return self._extra_payment_vector
+
+    def get_period_extra_vector(self) -> np.ndarray:
+        """
+        Returns the total extra payment made in each payment period. Each month's extra payment is made with the first
+        payment of that month.
+        :return: The extra payment per period, indexed by period. Period 0 is always 0.
+        """
+        return amortization.period_extras(self.get_extra_payment_vector(int(self._data.get("term"))),
+                                          self.periods_per_year())
+
     def launch_extra_payment_editor(self):
         root = self._app.get_root()
         ExtraPaymentWindow(root, self._app, self)
 
     # TODO support for insurance and property tax escrow
-    def amortization_schedule(self, extra_payments=False) -> dict:
+    def amortization_schedule(self, extra_payments=False, engine='python') -> dict:
         """
         Calculates the amortization schedule with extra payments for the loan and returns the schedule as a list.
+        Schedules are memoized in the shared schedule cache, keyed by schedule_fingerprint.
         @param extra_payments: The amount of extra payment per month
+        @param engine: 'python' for the row by row schedule, 'numpy' for the same schedule with its balance, interest
+        and extra columns as numpy arrays or 'cents' for the row by row schedule calculated in integer cents with the
+        cents_rounding rule. Batches of loans are amortized with amortization.amortize_batch.
         @return: The amortization schedule.
         """
-        amortization ={}
+        key = self.schedule_fingerprint(extra_payments, engine)
+        schedule = self.schedule_cache.get(key)
+        if schedule is None:
+            if engine == 'numpy':
+                schedule = self._amortization_arrays(extra_payments)
+            elif engine == 'cents':
+                schedule = self._amortization_cents(extra_payments)
+            elif engine == 'python':
+                schedule = self._amortization_rows(extra_payments)
+            else:
+                raise ValueError(f'Unknown amortization engine: {engine}')
+            self.schedule_cache.put(key, schedule)
+            self._schedule_keys.add(key)
+        return schedule
+
+    def iter_schedule(self, extra_payments=False, months: int = None) -> amortization.ScheduleStream:
+        """
+        Returns the amortization schedule as a stream of rows that are calculated lazily, one month at a time. The
+        totals are available from the stream's summary once iteration finishes or the stream is closed.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :param months: Optional. Stops the stream after this many months.
+        :return: A ScheduleStream of (month, principal, interest, extra) rows, starting with month 0.
+        """
+        summary = {}
+        first_row = (0, self._data.get("principal"), 0, 0)
+        return amortization.ScheduleStream(self._schedule_rows(extra_payments, summary), summary, first_row, months)
+
+    def _schedule_rows(self, extra_payments, summary: dict, start: int = 0, state: tuple = None,
+                       checkpoints: list = None):
+        """
+        Internal generator that calculates the schedule one month at a time, yielding (month, principal, interest,
+        extra) rows after month 0. The totals are written into summary when the generator finishes or is closed.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :param summary: The dict that receives the totals.
+        :param start: The month the schedule resumes after.
+        :param state: The (principal, total interest, total, last month, monthly rate, monthly payment) state at the
+        start month.
+        :param checkpoints: Optional. A list that receives the state every checkpoint_interval months.
+        """
+        principal = self._data.get("principal")
+        monthly_payment = self.periodic_payment()
+        m_rate = self.periodic_rate()
+        term = self.period_count()
+        extras = self.get_period_extra_vector().tolist() if extra_payments else None
+        resets = self.rate_resets()
+        interval = self.checkpoint_interval
+
+        total_interest = 0
+        total = 0
+        last_month = 0
+        if state is not None:
+            principal, total_interest, total, last_month, m_rate, monthly_payment = state
+
+        i = start
+        try:
+            for i in range(start + 1, term + 1):
+                if resets and i in resets and principal != 0:
+                    m_rate = resets.get(i) / 100 / 12
+                    monthly_payment = float(amortization.monthly_payment(principal, m_rate, term - i + 1))
+                if principal != 0:
+                    extra = 0
+                    interest = round(principal * m_rate, 2)
+                    principal = principal + interest - monthly_payment
+                    if extra_payments:
+                        extra = extras[i]
+                        principal -= extra
+                    if principal < 0:
+                        print("last month:", i)
+                        extra -= principal
+                        principal = 0
+                        last_month = i
+                    row = (i, principal, interest, extra)
+                    total_interest += interest
+                    total += extra + interest + principal
+                else:
+                    row = (0, 0, 0, 0)
+                if checkpoints is not None and i % interval == 0:
+                    checkpoints.append((principal, total_interest, total, last_month, m_rate, monthly_payment))
+                yield row
+        finally:
+            complete = i == term
+            if last_month == 0 and complete:
+                last_month = term
+            summary.update({
+                'total': round(total, 2),
+                'total interest': round(total_interest, 2),
+                'monthly payment': self.data('monthly payment'),
+                'last month': last_month if last_month != 0 else None,
+                'months': i,
+                'complete': complete
+            })
+
+    def _amortization_rows(self, extra_payments=False) -> dict:
+        """
+        Calculates the amortization schedule month by month as a Schedule of [month, principal, interest, extra] rows.
+        The balance and totals of extra payment schedules are checkpointed every checkpoint_interval months, so when only
+        the extra payments change the schedule is recomputed from the checkpoint before the first changed month.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: The amortization schedule.
+        """
+        summary = {}
         principal = self._data.get("principal")
         monthly_payment = self.data('monthly payment')
         print('monthly payment:', monthly_payment)
+
+        start = 0
+        state = None
+        schedule = amortization.Schedule.from_rows([[0, principal, 0, 0]])
+        checkpoints = [(principal, 0, 0, 0, self.periodic_rate(), self.periodic_payment())]
+        if extra_payments:
+            vector = self.get_period_extra_vector()
+            base = self.schedule_fingerprint()
+            resumed = self._resume_from_checkpoint(base, vector)
+            if resumed is not None:
+                start, schedule, checkpoints = resumed
+                state = checkpoints[-1]
+
+        append = schedule.append
+        for row in self._schedule_rows(extra_payments, summary, start, state, checkpoints):
+            append(*row)
+
+        if extra_payments:
+            self._checkpoints = {
+                'base': base,
+                'extras': vector.copy(),
+                'schedule': schedule,
+                'checkpoints': checkpoints
+            }
+
+        return {
+            'total': summary.get('total'),
+            'total interest': summary.get('total interest'),
+            'monthly payment': monthly_payment,
+            'schedule': schedule,
+            'last month': summary.get('last month')
+        }
+
+    def _resume_from_checkpoint(self, base: tuple, extras: np.ndarray):
+        """
+        Internal method to find where an extra payment schedule can resume after the extra payments change. The months
+        before the first changed extra payment are unchanged, so the schedule restarts from the last checkpoint before
+        that month.
+        :param base: The principal, rate, term and monthly payment of the schedule being calculated.
+        :param extras: The extra payment vector of the schedule being calculated.
+        :return: The checkpoint month, the schedule rows up to it and the checkpoints up to it, or None.
+        """
+        previous = self._checkpoints
+        if previous is None or previous.get('base') != base:
+            return None
+
+        changed = np.flatnonzero(previous.get('extras') != extras)
+        first_changed = changed[0] if len(changed) > 0 else len(extras)
+        index = (first_changed - 1) // self.checkpoint_interval
+        month = index * self.checkpoint_interval
+        schedule = previous.get('schedule')[:month + 1]
+        checkpoints = previous.get('checkpoints')[:index + 1]
+
+        return month, schedule, checkpoints
+
+    def _amortization_cents(self, extra_payments=False) -> dict:
+        """
+        Calculates the amortization schedule in integer cents. Interest is rounded with the cents_rounding rule and the
+        balance never drifts, so the results match a lender's statement. Amounts are converted back to dollars.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: The amortization schedule.
+        """
+        monthly_payment = self.data('monthly payment')
+        extras = None
+        if extra_payments:
+            extras = np.rint(self.get_period_extra_vector() * 100).astype(np.int64).tolist()
+
+        result = amortization.amortize_cents(amortization.to_cents(self._data.get("principal")),
+                                             self._data.get("rate"), amortization.to_cents(self.periodic_payment()),
+                                             extras, self.period_count(), self.cents_rounding,
+                                             self.periods_per_year())
+
+        return {
+            'total': result.get('total') / 100,
+            'total interest': result.get('total interest') / 100,
+            'monthly payment': monthly_payment,
+            'schedule': amortization.Schedule.from_rows([i, balance / 100, interest / 100, extra / 100]
+                                                        for i, balance, interest, extra in result.get('schedule')),
+            'last month': result.get('last month')
+        }
+
+    def _amortization_arrays(self, extra_payments=False) -> dict:
+        """
+        Returns the row by row schedule with its balance, interest and extra payment columns as read-only numpy arrays
+        indexed by month. The arrays share the Schedule's memory.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: The amortization schedule with 'balance', 'interest' and 'extra' arrays.
+        """
+        result = dict(self.amortization_schedule(extra_payments, engine='python'))
+        schedule = result.get('schedule')
+        result.update({name: schedule.array(name) for name in ('balance', 'interest', 'extra')})
+        return result
+
+    def monthly_arrays(self, extra_payments=False) -> dict:
+        """
+        Returns the balance, interest and extra payment arrays of the loan by month, whatever the payment frequency. The
+        balance is taken at the end of each month, and the interest and extra payments are summed over the payments made
+        in each month.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: A dict of 'balance', 'interest' and 'extra' arrays indexed by month.
+        """
+        schedule = self.amortization_schedule(extra_payments, self.array_engine).get('schedule')
+        periods = self.periods_per_year()
+        arrays = {name: schedule.array(name) for name in ('balance', 'interest', 'extra')}
+        if periods == 12:
+            return arrays
+
+        ends = np.arange(int(self._data.get("term")) + 1) * periods // 12
+        monthly = {'balance': arrays.get('balance')[ends]}
+        for name in ('interest', 'extra'):
+            cumulative = np.cumsum(arrays.get(name))[ends]
+            monthly[name] = np.concatenate(([0], np.diff(cumulative)))
+        return monthly
+
+    def payment_segments(self, extra_payments=False) -> list:
+        """
+        Returns the segments of the loan over which the rate and total payment are constant, in payment periods.
+        :param extra_payments: Whether the loan's extra payments are included in the payments.
+        :return: A list of (start, end, periodic rate, payment) segments. The end period is exclusive.
+        """
         term = int(self._data.get("term"))
+        m_rate = self.periodic_rate()
+        payment = self.periodic_payment()
+        plan = self._extra_payments if extra_payments else []
+        if self.periods_per_year() == 12:
+            return [(start, end, m_rate, payment + amount)
+                    for start, end, amount in amortization.extra_payment_segments(plan, term)]
+
+        extras = self.get_period_extra_vector() if extra_payments else np.zeros(self.period_count() + 1)
+        changes = (np.flatnonzero(np.diff(extras[1:])) + 2).tolist()
+        starts = [1] + changes
+        ends = changes + [len(extras)]
+        return [(start, end, m_rate, payment + float(extras[start])) for start, end in zip(starts, ends)]
+
+    def payoff_summary(self, extra_payments=False) -> dict:
+        """
+        Calculates the last month and total interest of the loan in closed form, one extra payment segment at a time,
+        without building the month by month schedule. Interest is not rounded to the cent each month, so totals can
+        differ from amortization_schedule by a few cents.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: A dict with the total interest, last month and monthly payment of the loan.
+        """
+        term = self.period_count()
+        solved = amortization.solve_segments(self._data.get("principal"), self.payment_segments(extra_payments))
+        last_month = solved.get('last month')
+
+        return {
+            'total interest': round(solved.get('total interest'), 2),
+            'monthly payment': self.data('monthly payment'),
+            'last month': term if last_month is None else last_month
+        }
 
-        #TODO support for real dates
-        origination = self._data.get("origination")
-        first_payment = self._data.get("first payment")
+    @staticmethod
+    def as_date(when) -> date:
+        """
+        Converts a date string in YYYY-MM-DD format into a date. Dates are returned unchanged.
+        :param when: A date or a date string.
+        :return: The date.
+        """
+        if isinstance(when, str):
+            return datetime.strptime(when, '%Y-%m-%d').date()
+        return when
 
-        schedule = [[0, principal, 0, 0]]
-        total_interest = 0
-        total = 0
-        last_month = 0
-        for i in range(1, term + 1):
-            if principal != 0:
-                extra = 0
-                interest = self.calc_m_interest(principal)
-                principal = principal + interest - monthly_payment
-                if extra_payments:
-                    for e in self._extra_payments:
-                        if e.start <= i < e.end:
-                            extra += e.amount
-                    principal -= extra
-                if principal < 0:
-                    print("last month:", i)
-                    extra -= principal
-                    principal = 0
-                    last_month = i
-                schedule.append([i, principal, interest, extra])
-                total_interest += interest
-                total += extra + interest + principal
-            else:
-                schedule.append([0, 0, 0, 0])
+    def month_of(self, when, limit: int = None) -> int:
+        """
+        Converts a point in time into a month of the loan. Month 1 is the month of the first payment, so a date is
+        mapped to the number of payments made on or before it.
+        :param when: A month number, a date, or a date string in YYYY-MM-DD format.
+        :param limit: Optional. The last month of the loan. Defaults to the term.
+        :return: The month of the loan, limited to the range 0 to limit.
+        """
+        term = int(self._data.get("term")) if limit is None else limit
+        if isinstance(when, str):
+            when = self.as_date(when)
+        if isinstance(when, date):
+            first_payment = self.as_date(self._data.get('first payment'))
+            month = (when.year - first_payment.year) * 12 + when.month - first_payment.month + 1
+            if when.day < first_payment.day:
+                month -= 1
+        else:
+            month = int(when)
+        return min(max(month, 0), term)
+
+    def balance_at(self, when, extra_payments=False) -> float:
+        """
+        Returns the remaining principal after a given month, calculated in closed form without building the schedule.
+        :param when: A month number or date. See month_of.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: The remaining principal.
+        """
+        period = self.month_of(when) * self.periods_per_year() // 12
+        solved = amortization.solve_segments(self._data.get("principal"), self.payment_segments(extra_payments), period)
+        return round(max(solved.get('balance'), 0), 2)
+
+    def interest_through(self, when, extra_payments=False) -> float:
+        """
+        Returns the cumulative interest paid through a given month, calculated in closed form without building the
+        schedule.
+        :param when: A month number or date. See month_of.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: The total interest paid through that month.
+        """
+        period = self.month_of(when) * self.periods_per_year() // 12
+        solved = amortization.solve_segments(self._data.get("principal"), self.payment_segments(extra_payments), period)
+        return round(solved.get('total interest'), 2)
+
+    def equity_at(self, when, extra_payments=False) -> float:
+        """
+        Returns the equity after a given month: the total amount financed and paid down less the remaining principal.
+        :param when: A month number or date. See month_of.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: The equity.
+        """
+        return round(self.data('total') - self.balance_at(when, extra_payments), 2)
+
+    def monthly_extra_plan(self, amount, start: int = 1) -> list:
+        """
+        Builds an extra payment plan that pays the same extra amount every month.
+        :param amount: The extra amount paid each month.
+        :param start: The first month of extra payments.
+        :return: A list with a single ExtraPayment.
+        """
+        term = int(self._data.get("term"))
+        return [ExtraPayment(start, term - start + 1, amount)]
 
-        amortization.update({'total': round(total, 2)})
-        amortization.update({'total interest': round(total_interest, 2)})
-        amortization.update({'monthly payment': monthly_payment})
-        amortization.update({'schedule': schedule})
-        if last_month == 0:
-            last_month = term
-        amortization.update({'last month': last_month})
+    def lump_sum_plan(self, amount, interval: int = 12) -> list:
+        """
+        Builds an extra payment plan that pays a lump sum at a regular interval, for example once a year.
+        :param amount: The lump sum.
+        :param interval: The number of months between lump sums.
+        :return: A list of one month ExtraPayments.
+        """
+        term = int(self._data.get("term"))
+        return [ExtraPayment(month, 1, amount) for month in range(interval, term + 1, interval)]
 
-        return amortization
+    def compare_plans(self, plans: dict) -> list:
+        """
+        Compares many extra payment plans against the schedule without extra payments. All plans are amortized together
+        as a plans x months matrix in a single pass of the numpy engine.
+        :param plans: A dict of plan names to lists of ExtraPayment objects.
+        :return: A list of dicts with the results of each plan, ranked by interest saved.
+        """
+        term = int(self._data.get("term"))
+        names = list(plans.keys())
+        count = len(names) + 1
+        extras = amortization.extra_payment_matrix([[]] + [plans.get(name) for name in names], term)
+        extras = amortization.period_extras(extras, self.periods_per_year())
+        m_rate = np.full(count, self.periodic_rate())
+        principal = np.full(count, float(self._data.get("principal")))
+        payment = np.full(count, float(self.periodic_payment()))
+        result = amortization.amortize(principal, m_rate, payment, extras, self.period_count())
+
+        return self._rank_plans(names, result.get('total interest'), result.get('last month'), extras,
+                                self.periods_per_year())
 
-    def compare_schedules(self, display_graph=False) -> tuple:
+    @staticmethod
+    def _rank_plans(names: list, total_interest, last_month, extras: np.ndarray, periods: int = 12) -> list:
+        """
+        Internal method to rank extra payment plans against the schedule without extra payments.
+        :param names: The plan names.
+        :param total_interest: The total interest of each schedule. Index 0 is the schedule without extra payments.
+        :param last_month: The last month of each schedule, indexed the same way.
+        :param extras: The extra payment matrix of the schedules.
+        :param periods: The number of payment periods per year. The last months are payment periods when it is not 12.
+        :return: A list of dicts with the results of each plan, ranked by interest saved.
+        """
+        ranking = []
+        for i, name in enumerate(names, start=1):
+            months_saved = int(last_month[0] - last_month[i]) * 12 // periods
+            ranking.append({
+                'plan': name,
+                'last month': int(last_month[i]),
+                'months saved': months_saved % 12,
+                'years saved': months_saved // 12,
+                'total months saved': months_saved,
+                'total interest': float(total_interest[i]),
+                'interest saved': round(float(total_interest[0] - total_interest[i]), 2),
+                'total extra': round(float(extras[i, :last_month[i] + 1].sum()), 2)
+            })
+        ranking.sort(key=lambda r: (-r.get('interest saved'), -r.get('total months saved')))
+
+        return ranking
+
+    def compare_schedules(self, display_graph=False, schedules=True) -> tuple:
         """
         Returns the amortization schedules of the loan with and without extra payments applied.
         :param display_graph: Optional. Displays a graph of the two schedules principal amounts over time.
+        :param schedules: Optional. When False, only the closed form payoff summaries are calculated and compared.
         :return: Tuple of the schedules, Schedule with no extra payments and Schedule with extra payments.
         """
-        no_extra = self.amortization_schedule()
-        extra = self.amortization_schedule(True)
-        m_saved =(no_extra.get('last month') - extra.get('last month')) % 12
+        if schedules or display_graph:
+            no_extra = self.amortization_schedule()
+            extra = self.amortization_schedule(True)
+        else:
+            no_extra = self.payoff_summary()
+            extra = self.payoff_summary(True)
+        periods = self.periods_per_year()
+        saved = (no_extra.get('last month') - extra.get('last month')) * 12 // periods
+        m_saved = saved % 12
         print(no_extra.get('last month'))
         print(extra.get('last month'))
-        y_saved = int((no_extra.get('last month') - extra.get('last month')) / 12)
+        y_saved = int(saved / 12)
         diff_interest = (no_extra.get('total interest') - extra.get('total interest'))
         difference = {
             'months saved': m_saved,
@@ -161,11 +634,10 @@ class Loan(FinanceObj):
         }
 
         if display_graph:
-            schedule_no_extra = [item[1] for item in no_extra.get('schedule')]
-            schedule_extra = [item[1] for item in extra.get('schedule')]
-            term = self._data.get("term")
-            pyplot.plot(range(term+1), schedule_no_extra, color='r', label="no extra payment")
-            pyplot.plot(range(term+1), schedule_extra, color='b', label="with extra payments")
+            schedule_no_extra = no_extra.get('schedule').column('balance')
+            schedule_extra = extra.get('schedule').column('balance')
+            pyplot.plot(range(len(schedule_no_extra)), schedule_no_extra, color='r', label="no extra payment")
+            pyplot.plot(range(len(schedule_extra)), schedule_extra, color='b', label="with extra payments")
             pyplot.xlabel("months")
             pyplot.ylabel("principal")
             pyplot.show()
@@ -190,6 +662,9 @@ class Loan(FinanceObj):
         index = self.tk_editable_entry('rate', 'Rate', frame, index)
         tk.Label(frame, text=f'= ${monthly:,}', anchor='e').grid(column=2, row=index, columnspan=1, sticky=W+E)
         index += 1
+        if len(self.payment_frequencies) > 1:
+            index = self.tk_editable_dropdown('payment frequency', 'Payment Frequency', list(self.payment_frequencies),
+                                              frame, index)
         index = self.tk_line_break(frame, index)
 
         extra_payments = tk.Button(frame, text='Extra Payments')
@@ -206,6 +681,8 @@ class Mortgage(Loan):
         self._type = "Mortgage"
 
         self._assessment_override = False
+        self._plans = {}
+        self._offers = []
 
         self._data.update({
             'pmi': 100,
@@ -221,7 +698,10 @@ class Mortgage(Loan):
         self._assumptions.update({
             'assessed value': 200000,
             'property tax rate': 1,
-            'pmi rate': 0.5
+            'pmi rate': 0.5,
+            'pmi cancellation ltv': 78,
+            'property tax growth': 2,
+            'insurance growth': 3
         })
         self.calc_total_monthly()
         self.calculate_assessed_value()
@@ -255,7 +735,16 @@ class Mortgage(Loan):
         else:
             return 0
 
-    def calc_escrow(self) -> float:
+    def calc_escrow(self, month=None) -> float:
+        """
+        Calculates the monthly escrow of property tax, insurance and PMI.
+        :param month: Optional. A month number or date. See month_of. When given, the escrow for that month of the
+        escrow timeline is returned instead.
+        :return: The monthly escrow.
+        """
+        if month is not None:
+            return float(self.escrow_timeline().get('escrow')[self.month_of(month)])
+
         pmi = 0
         if self.data('pmi required') == 1:
             pmi = self.calc_PMI()
@@ -264,11 +753,99 @@ class Mortgage(Loan):
         self._data.update({'escrow': escrow})
         return escrow
 
-    def calc_total_monthly(self) -> float:
+    def escrow_timeline(self, extra_payments=False) -> dict:
+        """
+        Calculates the escrow month by month alongside the amortization arrays. Property tax and insurance grow once a
+        year by their growth assumptions, and PMI is charged until the balance at the start of a month falls to the PMI
+        cancellation LTV of the original value. The cancellation month is found directly on the balance curve.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: A dict of arrays indexed by month for 'payment', 'property tax', 'insurance', 'pmi', 'escrow' and
+        'total monthly', and the 'pmi cancellation month', the first month without PMI, or None if PMI is not charged.
+        """
+        term = int(self.data('term'))
+        arrays = self.monthly_arrays(extra_payments)
+        balance = arrays.get('balance')
+        payment = np.zeros(term + 1)
+        payment[1:] = amortization.round_cents(balance[:-1] - balance[1:] + arrays.get('interest')[1:] -
+                                               arrays.get('extra')[1:])
+
+        years = np.zeros(term + 1)
+        years[1:] = (np.arange(1, term + 1) - 1) // 12
+        property_tax = self.data('property tax') / 12 * (1 + self.assume('property tax growth') / 100) ** years
+        insurance = self.data('insurance premium') / 12 * (1 + self.assume('insurance growth') / 100) ** years
+        property_tax[0] = insurance[0] = 0
+
+        pmi = np.zeros(term + 1)
+        cancellation = None
+        pmi_amount = self.calc_PMI() if self.data('pmi required') == 1 else 0
+        if pmi_amount > 0:
+            threshold = self.data('total') * self.assume('pmi cancellation ltv') / 100
+            cancellation = min(int(np.searchsorted(-balance, -threshold)) + 1, term + 1)
+            pmi[1:cancellation] = pmi_amount
+
+        escrow = amortization.round_cents(property_tax + insurance + pmi)
+        return {
+            'payment': payment,
+            'property tax': amortization.round_cents(property_tax),
+            'insurance': amortization.round_cents(insurance),
+            'pmi': pmi,
+            'escrow': escrow,
+            'total monthly': amortization.round_cents(payment + escrow),
+            'pmi cancellation month': cancellation
+        }
+
+    def sensitivity_grid(self, rates, terms, down_payments) -> dict:
+        """
+        Evaluates the monthly payment, PMI, escrow, total monthly payment and total interest of the mortgage over every
+        combination of rate, term and down payment. The grid is calculated with numpy broadcasting and does not change
+        the mortgage's data.
+        :param rates: The annual rates to evaluate, as percentages.
+        :param terms: The terms to evaluate, in months.
+        :param down_payments: The down payments to evaluate.
+        :return: A dict with the 'rate', 'term' and 'down payment' axes and arrays of shape (rates, terms, down payments)
+        for each figure.
+        """
+        rates = np.asarray(rates, dtype=float)
+        terms = np.asarray(terms, dtype=int)
+        down_payments = np.asarray(down_payments, dtype=float)
+        total = float(self.data('total'))
+
+        m_rate = amortization.monthly_rate(rates)[:, None, None]
+        term = terms[None, :, None]
+        principal = total - down_payments[None, None, :]
+        monthly = amortization.monthly_payment(principal, m_rate, term)
+        total_interest = amortization.round_cents(monthly * term - principal)
+
+        pmi = np.zeros_like(principal)
+        if self.data('pmi required') == 1:
+            percent_down = amortization.round_cents(1 - (principal / total))
+            pmi_rate = self.assume('pmi rate') / 100
+            pmi = np.where(percent_down < 0.2, amortization.round_cents((principal * pmi_rate) / 12), 0)
+        escrow = amortization.round_cents(((self.data('insurance premium') + self.data('property tax')) / 12) + pmi)
+        shape = monthly.shape
+
+        return {
+            'axes': ('rate', 'term', 'down payment'),
+            'rate': rates,
+            'term': terms,
+            'down payment': down_payments,
+            'monthly payment': monthly,
+            'pmi': np.broadcast_to(pmi, shape),
+            'escrow': np.broadcast_to(escrow, shape),
+            'total monthly': amortization.round_cents(monthly + escrow),
+            'total interest': total_interest
+        }
+
+    def calc_total_monthly(self, month=None) -> float:
         """
         Calculates the monthly payment.
-        :return: Nothing.
+        :param month: Optional. A month number or date. See month_of. When given, the payment and escrow for that month
+        of the escrow timeline are returned instead.
+        :return: The total monthly payment.
         """
+        if month is not None:
+            return float(self.escrow_timeline().get('total monthly')[self.month_of(month)])
+
         print('monthly total?')
         monthly = self.calc_monthly()
         escrow = self.calc_escrow()
@@ -285,10 +862,100 @@ class Mortgage(Loan):
 
         return frame, index
 
-    # TODO implement
+    def get_plans(self) -> dict:
+        """
+        Returns the candidate extra payment plans shown in the detail view.
+        :return: A dict of plan names to lists of ExtraPayment objects.
+        """
+        return self._plans
+
+    def add_plan(self, name: str, plan: list) -> None:
+        """
+        Adds a candidate extra payment plan to compare in the detail view.
+        :param name: The name of the plan.
+        :param plan: A list of ExtraPayment objects.
+        """
+        self._plans.update({name: plan})
+
+    def rem_plan(self, name: str) -> bool:
+        """
+        Removes a candidate extra payment plan if it exists.
+        :param name: The name of the plan.
+        :return: True if there was a plan to be removed.
+        """
+        return self._plans.pop(name, None) is not None
+
+    def get_offers(self) -> list:
+        """
+        Returns the lender offers compared in the comparison tool.
+        :return: A list of Offer objects.
+        """
+        return self._offers
+
+    def add_offer(self, offer) -> None:
+        """
+        Adds a lender offer to compare.
+        :param offer: The Offer to add.
+        """
+        self._offers.append(offer)
+
+    def rem_offer(self, offer) -> bool:
+        """
+        Removes a lender offer if it exists.
+        :param offer: The Offer to remove.
+        :return: True if there was an offer to be removed.
+        """
+        if offer in self._offers:
+            self._offers.remove(offer)
+            return True
+        return False
+
+    def rank_offers(self, offers: list = None, workers: int = None) -> list:
+        """
+        Ranks lender offers for this property by total cost, break-even month and monthly payment. See
+        amortization.rank_offers.
+        :param offers: Optional. The offers to rank. Defaults to the mortgage's offers.
+        :param workers: The number of worker processes used for large offer sets.
+        :return: A list of dicts with the results of each offer, ranked.
+        """
+        if offers is None:
+            offers = self._offers
+        return amortization.rank_offers(self.calc_principal(), self.data('total'), offers,
+                                        self.assume('pmi cancellation ltv'), workers=workers)
+
+    def refinance_analysis(self, offers: list, months=None, extra_payments=False) -> dict:
+        """
+        Calculates the break-even month and lifetime savings of refinancing into each offer after each future month.
+        The mortgage's own balance and interest arrays are reused for every combination. See
+        amortization.refinance_grid.
+        :param offers: A list of Offer objects.
+        :param months: Optional. The months after which to refinance. Defaults to every month before the loan is paid
+        off.
+        :param extra_payments: Whether the loan's extra payments are applied to the existing loan.
+        :return: A dict with the 'offers', the refinance 'months', the offers x months grids, and the 'best month' to
+        refinance into each offer with its 'best savings'.
+        """
+        arrays = self.monthly_arrays(extra_payments)
+        if months is None:
+            months = np.arange(1, np.count_nonzero(arrays.get('balance')))
+        months = np.asarray(months, dtype=int)
+
+        grid = amortization.refinance_grid(arrays.get('balance'), arrays.get('interest'), months,
+                                           [float(o.rate) for o in offers], [int(o.term) for o in offers],
+                                           [float(o.points) for o in offers], [float(o.fees) for o in offers])
+        best = grid.get('lifetime savings').argmax(axis=1) if len(months) > 0 else np.zeros(len(offers), dtype=int)
+        grid.update({
+            'offers': offers,
+            'months': months,
+            'best month': months[best] if len(months) > 0 else best,
+            'best savings': np.take_along_axis(grid.get('lifetime savings'), best[:, None], axis=1)[:, 0]
+            if len(months) > 0 else np.zeros(len(offers))
+        })
+        return grid
+
     def launch_comparison_tool(self):
-        print('party')
-        pass
+        root = self._app.get_root()
+        OfferComparisonWindow(root, self._app, self)
 
     def get_detail(self, root):
         self.calc_total_monthly()
@@ -308,15 +975,15 @@ class Mortgage(Loan):
         stats = tk.Frame(root, height=290)
         stats.pack(fill=X, padx=10, pady=(0, 0))
         stats.pack_propagate(False)
-        self.get_detail_stat(stats)
+        self.get_detail_stat(stats, self.escrow_timeline(True))
 
         # MAIN GRAPH
         graph = tk.Frame(stats)
         graph.pack(side=RIGHT)
         graph.pack_propagate(False)
 
-        s1 = [schedule[1] for schedule in comparison.get('no extra').get('schedule')]
-        s2 = [schedule[1] for schedule in comparison.get('extra').get('schedule')]
+        s1 = comparison.get('no extra').get('schedule').column('balance')
+        s2 = comparison.get('extra').get('schedule').column('balance')
         schedules = [s1, s2]
         self.create_graph(graph, schedules, title="Loan Comparison")
 
@@ -338,12 +1005,41 @@ class Mortgage(Loan):
                 c.grid(padx=(10, 0))
             row += 1
 
+        if len(self._plans) > 0:
+            plans = tk.Frame(root, height=150)
+            plans.pack(fill=X, padx=10, pady=(15, 0))
+            plans.pack_propagate(False)
+            self.create_plan_comparison(plans, self.compare_plans(self._plans))
+
         detail = tk.Frame(root)
         detail.pack(fill=BOTH, expand=True, padx=10, pady=15)
         detail.pack_propagate(False)
 
         self.create_amortization(detail, comparison)
 
+    def create_plan_comparison(self, root, ranking):
+        tree = ttk.Treeview(root)
+        tree.pack(side=BOTTOM, expand=True, fill=BOTH)
+        tree['columns'] = ('payoff', 'time saved', 'interest saved', 'total extra')
+        tree.heading('#0', text='Plan')
+        tree.column('payoff', width=50)
+        tree.heading('payoff', text='Payoff Month')
+        tree.column('time saved', width=50)
+        tree.heading('time saved', text='Time Saved')
+        tree.column('interest saved', width=50)
+        tree.heading('interest saved', text='Interest Saved')
+        tree.column('total extra', width=50)
+        tree.heading('total extra', text='Total Extra')
+
+        for i in range(len(ranking)):
+            plan = ranking[i]
+            time_saved = f'{plan.get("years saved")}y {plan.get("months saved")}m'
+            tree.insert('', 'end', f'{i}', text=f'{i + 1}. {plan.get("plan")}')
+            tree.set(f'{i}', 'payoff', f'{plan.get("last month")}')
+            tree.set(f'{i}', 'time saved', time_saved)
+            tree.set(f'{i}', 'interest saved', f'{locale.currency(plan.get("interest saved"), grouping=True)}')
+            tree.set(f'{i}', 'total extra', f'{locale.currency(plan.get("total extra"), grouping=True)}')
+
     def create_amortization(self, root, schedules):
         tree = ttk.Treeview(root)
         tree.pack(side=BOTTOM, expand=True, fill=BOTH)
@@ -361,19 +1057,21 @@ class Mortgage(Loan):
 
         s1 = schedules.get('no extra').get('schedule')
         s2 = schedules.get('extra').get('schedule')
+        balance_1, interest_1 = s1.column('balance'), s1.column('interest')
+        balance_2, interest_2, extra_2 = s2.column('balance'), s2.column('interest'), s2.column('extra')
         for i in range(len(s1)):
             tree.insert('', 'end', f'{i}', text=f'Month: {i}')
-            tree.set(f'{i}', 'normal', f'{locale.currency(s1[i][1], grouping=True)}')
-            tree.set(f'{i}', 'normal interest', f'{locale.currency(s1[i][2], grouping=True)}')
+            tree.set(f'{i}', 'normal', f'{locale.currency(balance_1[i], grouping=True)}')
+            tree.set(f'{i}', 'normal interest', f'{locale.currency(interest_1[i], grouping=True)}')
             if i < len(s2):
                 # print(i)
-                tree.set(f'{i}', 'accelerated', f'{locale.currency(s2[i][1], grouping=True)}')
-                tree.set(f'{i}', 'accelerated interest', f'{locale.currency(s2[i][2], grouping=True)}')
-                tree.set(f'{i}', 'extra payment', f'{locale.currency(s2[i][3], grouping=True)}')
+                tree.set(f'{i}', 'accelerated', f'{locale.currency(balance_2[i], grouping=True)}')
+                tree.set(f'{i}', 'accelerated interest', f'{locale.currency(interest_2[i], grouping=True)}')
+                tree.set(f'{i}', 'extra payment', f'{locale.currency(extra_2[i], grouping=True)}')
             elif i == len(s2):
                 tree.set(f'{i}', 'accelerated', f'$0.00')
 
-    def get_detail_stat(self, root):
+    def get_detail_stat(self, root, timeline: dict = None):
         stat_detail = tk.Frame(root, width=200)
         stat_detail.pack(side=LEFT, fill=Y, padx=(0, 10), pady=(15, 0))
         stat_detail.columnconfigure(0, weight=1)
@@ -420,6 +1118,11 @@ class Mortgage(Loan):
             tk.Label(stat_detail, text='PMI Payment:', anchor='e').grid(column=0, row=index, sticky=W + E)
             tk.Label(stat_detail, text=f' ${self.data("pmi"):,}', anchor='e').grid(column=1, row=index, sticky=W + E)
             index += 1
+            if timeline is not None and timeline.get('pmi cancellation month') is not None:
+                pmi_ends = f' Month {timeline.get("pmi cancellation month")}'
+                tk.Label(stat_detail, text='PMI Ends:', anchor='e').grid(column=0, row=index, sticky=W + E)
+                tk.Label(stat_detail, text=pmi_ends, anchor='e').grid(column=1, row=index, sticky=W + E)
+                index += 1
 
         insurance_premium = round(self.data("insurance premium") / 12, 2)
         tk.Label(stat_detail, text='Insurance Premium:', anchor='e').grid(column=0, row=index, sticky=W + E)
@@ -481,10 +1184,204 @@ class Mortgage(Loan):
                 c['bg'] = Style.color("b_sel")
 
 
-#TODO Implement
 class VariableRateMortgage(Mortgage):
-    def __init__(self, total=0, rate=1, length=60) -> None:
-        super(Mortgage, self).__init__()
+    # Rate resets are scheduled in months, so adjustable rate loans are always paid monthly.
+    payment_frequencies = {'Monthly': 12}
+
+    def __init__(self, app, name: str, desc: str = "") -> None:
+        super().__init__(app, name, desc)
+        self._type = "Variable Rate Mortgage"
+        self._index_path = []
+
+        self._data.update({
+            'initial period': 60,
+            'reset interval': 12,
+            'margin': 2.75,
+            'initial cap': 2,
+            'periodic cap': 2,
+            'lifetime cap': 5,
+            'rate floor': 2.75
+        })
+        self._assumptions.update({
+            'index rate': 4
+        })
+
+    @staticmethod
+    def __str__():
+        return f'Variable Rate Mortgage'
+
+    def get_index_path(self) -> list:
+        """
+        Returns the assumed index rate at each reset, in reset order.
+        :return: A list of index rates as percentages.
+        """
+        return self._index_path
+
+    def set_index_path(self, path: list) -> None:
+        """
+        Sets the assumed index rate at each reset. Resets past the end of the path keep the last index rate, and the
+        index rate assumption is used when the path is empty.
+        :param path: A list of index rates as percentages.
+        """
+        self._index_path = list(path)
+        self.invalidate()
+
+    def rate_segments(self) -> list:
+        """
+        Returns the periods of the loan over which the rate is constant. The initial rate holds for the initial period,
+        then the rate resets every reset interval to the index rate plus the margin, limited by the initial cap at the
+        first reset, the periodic cap after that, the lifetime cap above the initial rate and the rate floor.
+        :return: A list of (start, end, annual rate) segments. The end month is exclusive.
+        """
+        term = int(self.data('term'))
+        starts = amortization.reset_months(term, int(self.data('initial period')), int(self.data('reset interval')))
+        path = self._index_path if len(self._index_path) > 0 else [float(self.assume('index rate'))]
+        index = [float(path[min(reset, len(path) - 1)]) for reset in range(len(starts) - 1)]
+        rates = amortization.reset_rates(float(self.data('rate')), [index], float(self.data('margin')),
+                                         float(self.data('initial cap')), float(self.data('periodic cap')),
+                                         float(self.data('lifetime cap')), float(self.data('rate floor')))[0]
+
+        rates = [float(self.data('rate'))] + rates.tolist()
+        ends = starts.tolist()[1:] + [term + 1]
+        return list(zip(starts.tolist(), ends, rates))
+
+    def rate_resets(self) -> dict:
+        """
+        Returns the months in which the rate of the loan changes and the payment is re-solved. Resets that leave the
+        rate unchanged keep the payment.
+        :return: A dict of reset months to the new annual rate.
+        """
+        segments = self.rate_segments()
+        return {segments[i][0]: segments[i][2] for i in range(1, len(segments)) if segments[i][2] != segments[i - 1][2]}
+
+    def calc_m_interest(self, amount, month: int = None) -> float:
+        """
+        Calculates the monthly interest for a given amount and month at the rate in effect that month.
+        :param amount: The principal remaining at the start of the period.
+        :param month: The month for which interest is to be calculated. Defaults to the initial rate.
+        :return: The amount of interest accrued that month
+        """
+        rate = float(self.data('rate'))
+        if month is not None:
+            for start, end, annual in self.rate_segments():
+                if start <= month < end:
+                    rate = annual
+        return round(amount * rate / 100 / 12, 2)
+
+    def schedule_fingerprint(self, extra_payments=False, engine='python') -> tuple:
+        """
+        Returns a hashable fingerprint of everything the amortization schedule depends on, including the rate path.
+        :param extra_payments: Whether extra payments are applied to the schedule.
+        :param engine: The amortization engine.
+        :return: The fingerprint tuple.
+        """
+        return super().schedule_fingerprint(extra_payments, engine) + (tuple(self.rate_segments()),)
+
+    def amortization_schedule(self, extra_payments=False, engine='python') -> dict:
+        """
+        Calculates the amortization schedule of the loan, re-solving the payment at every rate reset. Only the 'python'
+        engine models rate resets.
+        @param extra_payments: The amount of extra payment per month
+        @param engine: The amortization engine. Must be 'python'.
+        @return: The amortization schedule.
+        """
+        if engine != 'python':
+            raise ValueError(f'The {engine} engine does not support rate resets')
+        return super().amortization_schedule(extra_payments, engine)
+
+    def payment_segments(self, extra_payments=False) -> list:
+        """
+        Returns the segments of the loan over which the rate and total monthly payment are constant. The payment is
+        re-solved from the balance at each reset.
+        :param extra_payments: Whether the loan's extra payments are included in the payments.
+        :return: A list of (start, end, monthly rate, payment) segments. The end month is exclusive.
+        """
+        return self._plan_segments(self._extra_payments if extra_payments else [])
+
+    def _plan_segments(self, plan: list) -> list:
+        """
+        Internal method to build the payment segments of the loan with an extra payment plan applied.
+        :param plan: A list of ExtraPayment objects.
+        :return: A list of (start, end, monthly rate, payment) segments. The end month is exclusive.
+        """
+        term = int(self.data('term'))
+        extras = amortization.extra_payment_segments(plan, term)
+        balance = self.data('principal')
+        payment = self.data('monthly payment')
+
+        resets = self.rate_resets()
+        segments = []
+        for start, end, rate in self.rate_segments():
+            m_rate = rate / 100 / 12
+            if start in resets:
+                payment = float(amortization.monthly_payment(balance, m_rate, term - start + 1))
+            pieces = [(max(s, start), min(e, end), m_rate, payment + amount)
+                      for s, e, amount in extras if s < end and e > start]
+            segments.extend(pieces)
+            solved = amortization.solve_segments(balance, pieces)
+            if solved.get('last month') is not None:
+                break
+            balance = solved.get('balance')
+        return segments
+
+    def compare_plans(self, plans: dict) -> list:
+        """
+        Compares many extra payment plans against the schedule without extra payments. Each plan is solved in closed
+        form through the rate resets.
+        :param plans: A dict of plan names to lists of ExtraPayment objects.
+        :return: A list of dicts with the results of each plan, ranked by interest saved.
+        """
+        term = int(self.data('term'))
+        names = list(plans.keys())
+        plan_list = [[]] + [plans.get(name) for name in names]
+        extras = amortization.extra_payment_matrix(plan_list, term)
+
+        total_interest = np.zeros(len(plan_list))
+        last_month = np.full(len(plan_list), term)
+        for i, plan in enumerate(plan_list):
+            solved = amortization.solve_segments(self.data('principal'), self._plan_segments(plan))
+            total_interest[i] = round(solved.get('total interest'), 2)
+            if solved.get('last month') is not None:
+                last_month[i] = solved.get('last month')
+
+        return self._rank_plans(names, total_interest, last_month, extras)
+
+    def simulate(self, paths: int = 1000, volatility: float = 0.5, drift: float = 0, seed: int = 0,
+                 workers: int = None, chunk_size: int = 250) -> dict:
+        """
+        Simulates the loan over many random index paths starting from the index rate assumption, and returns percentile
+        bands of the monthly payment and total interest. Results are reproducible for a given seed and chunk size.
+        :param paths: The number of rate paths.
+        :param volatility: The standard deviation of the index change at each reset, in percentage points.
+        :param drift: The mean index change at each reset, in percentage points.
+        :param seed: The random seed.
+        :param workers: The number of worker processes. 1 runs the simulation in this process.
+        :param chunk_size: The number of paths generated and amortized together.
+        :return: The percentile bands. See amortization.simulate_rate_paths.
+        """
+        keys = ('principal', 'rate', 'term', 'monthly payment', 'initial period', 'reset interval', 'margin',
+                'initial cap', 'periodic cap', 'lifetime cap', 'rate floor')
+        params = {key: float(self.data(key)) for key in keys}
+        params.update({
+            'index': float(self.assume('index rate')),
+            'drift': drift,
+            'volatility': volatility
+        })
+        return amortization.simulate_rate_paths(params, paths, seed, chunk_size, workers)
+
+    def get_editable(self, root) -> tuple:
+        frame, index = super().get_editable(root)
+
+        index = self.tk_line_break(frame, index)
+        index = self.tk_editable_entry('initial period', 'Initial Period', frame, index, 'Months')
+        index = self.tk_editable_entry('reset interval', 'Reset Interval', frame, index, 'Months')
+        index = self.tk_editable_entry('margin', 'Margin', frame, index)
+        index = self.tk_editable_entry('initial cap', 'Initial Cap', frame, index)
+        index = self.tk_editable_entry('periodic cap', 'Periodic Cap', frame, index)
+        index = self.tk_editable_entry('lifetime cap', 'Lifetime Cap', frame, index)
+        index = self.tk_editable_entry('rate floor', 'Rate Floor', frame, index)
+
+        return frame, index
 
 
 #TODO Implement
@@ -501,15 +1398,254 @@ class Auto(Loan):
 
 
 class Student(Loan):
+    # The daily engine accrues interest between monthly due dates, so student loans are always paid monthly.
+    payment_frequencies = {'Monthly': 12}
+
     def __init__(self, app, name: str, desc: str = ""):
         super().__init__(app, name, desc)
+        self._deferments = []
+        self._capitalizations = []
+
+        self._data.update({
+            'day count': 'actual/365'
+        })
 
     @staticmethod
     def __str__():
         return f'Student'
 
+    def get_deferments(self) -> list:
+        """
+        Returns the deferment periods of the loan.
+        :return: A list of (start, end) date tuples.
+        """
+        return self._deferments
+
+    def add_deferment(self, start, end) -> None:
+        """
+        Adds a deferment period. No payments are due on payment dates within it, interest keeps accruing and the unpaid
+        interest is capitalized when it ends.
+        :param start: The first day of the deferment, as a date or YYYY-MM-DD string.
+        :param end: The last day of the deferment, as a date or YYYY-MM-DD string.
+        """
+        self._deferments.append((self.as_date(start), self.as_date(end)))
+        self._deferments.sort()
+        self.invalidate()
+
+    def rem_deferment(self, start, end) -> bool:
+        """
+        Removes a deferment period if it exists.
+        :param start: The first day of the deferment.
+        :param end: The last day of the deferment.
+        :return: True if there was a deferment to be removed.
+        """
+        deferment = (self.as_date(start), self.as_date(end))
+        if deferment in self._deferments:
+            self._deferments.remove(deferment)
+            self.invalidate()
+            return True
+        return False
+
+    def add_capitalization(self, when) -> None:
+        """
+        Adds a date on which unpaid interest is capitalized, for example the end of the grace period.
+        :param when: The date, as a date or YYYY-MM-DD string.
+        """
+        self._capitalizations.append(self.as_date(when))
+        self._capitalizations.sort()
+        self.invalidate()
+
+    def schedule_fingerprint(self, extra_payments=False, engine='daily') -> tuple:
+        """
+        Returns a hashable fingerprint of everything the amortization schedule depends on, including the dates, day
+        count and interest events of the daily engine.
+        :param extra_payments: Whether extra payments are applied to the schedule.
+        :param engine: The amortization engine.
+        :return: The fingerprint tuple.
+        """
+        return super().schedule_fingerprint(extra_payments, engine) + (
+            str(self.data('origination')), str(self.data('first payment')), self.data('day count'),
+            tuple(self._deferments), tuple(self._capitalizations))
+
+    def amortization_schedule(self, extra_payments=False, engine='daily') -> dict:
+        """
+        Calculates the amortization schedule of the loan. Student loans default to the 'daily' engine, which accrues
+        simple interest daily under the loan's day count. See Loan.amortization_schedule for the other engines.
+        @param extra_payments: The amount of extra payment per month
+        @param engine: 'daily', 'python', 'cents' or 'numpy'.
+        @return: The amortization schedule.
+        """
+        if engine != 'daily':
+            return super().amortization_schedule(extra_payments, engine)
+
+        key = self.schedule_fingerprint(extra_payments, engine)
+        schedule = self.schedule_cache.get(key)
+        if schedule is None:
+            schedule = self._amortization_daily(extra_payments)
+            self.schedule_cache.put(key, schedule)
+            self._schedule_keys.add(key)
+        return schedule
+
+    def _interest_events(self, start: date, end: date) -> list:
+        """
+        Internal method to list the capitalization dates in a payment period. Deferments capitalize on the day after
+        they end.
+        :param start: The first day of the period.
+        :param end: The payment date that ends the period.
+        :return: The sorted capitalization dates after start and on or before end.
+        """
+        events = [when for when in self._capitalizations if start < when <= end]
+        events += [last + timedelta(days=1) for first, last in self._deferments if start < last + timedelta(days=1) <= end]
+        return sorted(set(events))
+
+    def iter_schedule(self, extra_payments=False, months: int = None) -> amortization.ScheduleStream:
+        """
+        Returns the daily engine's schedule as a stream of rows that are calculated lazily, one payment period at a
+        time. See Loan.iter_schedule.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :param months: Optional. Stops the stream after this many payment periods.
+        :return: A ScheduleStream of (month, principal, interest, extra) rows, starting with month 0.
+        """
+        summary = {}
+        first_row = (0, self.data('principal'), 0, 0)
+        return amortization.ScheduleStream(self._daily_rows(extra_payments, summary), summary, first_row, months)
+
+    def payoff_summary(self, extra_payments=False) -> dict:
+        """
+        Returns the total interest, last month and monthly payment of the daily engine's schedule. Daily interest has no
+        closed form, so the summary is read from the cached schedule.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: A dict with the total interest, last month and monthly payment of the loan.
+        """
+        schedule = self.amortization_schedule(extra_payments)
+        return {
+            'total interest': schedule.get('total interest'),
+            'monthly payment': schedule.get('monthly payment'),
+            'last month': schedule.get('last month')
+        }
+
+    def balance_at(self, when, extra_payments=False) -> float:
+        """
+        Returns the remaining principal after a given payment period of the daily engine's schedule. Deferments add
+        periods, so dates past the term map to the end of the schedule.
+        :param when: A month number or date. See month_of.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: The remaining principal.
+        """
+        schedule = self.amortization_schedule(extra_payments).get('schedule')
+        return round(schedule[self.month_of(when, len(schedule) - 1)][1], 2)
+
+    def interest_through(self, when, extra_payments=False) -> float:
+        """
+        Returns the cumulative interest charged through a given payment period of the daily engine's schedule.
+        :param when: A month number or date. See month_of.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: The total interest through that period.
+        """
+        schedule = self.amortization_schedule(extra_payments).get('schedule')
+        month = self.month_of(when, len(schedule) - 1)
+        return round(float(schedule.array('interest')[1:month + 1].sum()), 2)
+
+    def _amortization_daily(self, extra_payments=False) -> dict:
+        """
+        Calculates the amortization schedule with daily simple interest. See _daily_rows.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :return: The amortization schedule, in the same structure as amortization_schedule.
+        """
+        summary = {}
+        schedule = amortization.Schedule.from_rows([[0, self.data('principal'), 0, 0]])
+        for row in self._daily_rows(extra_payments, summary):
+            schedule.append(*row)
+        for _ in range(len(schedule), int(self.data('term')) + 1):
+            schedule.append(0, 0, 0, 0)
+
+        return {
+            'total': summary.get('total'),
+            'total interest': summary.get('total interest'),
+            'monthly payment': summary.get('monthly payment'),
+            'schedule': schedule,
+            'last month': summary.get('last month')
+        }
+
+    def _daily_rows(self, extra_payments, summary: dict):
+        """
+        Internal generator that calculates the schedule with daily simple interest, yielding (month, principal,
+        interest, extra) rows after month 0. Interest for each payment period is calculated from the day count between
+        the period's events. Payments are applied to accrued interest first. After unpaid interest is capitalized the payment is re-solved
+        over the remaining payments. The totals are written into summary when the generator finishes or is closed.
+        :param extra_payments: Whether the loan's extra payments are applied.
+        :param summary: The dict that receives the totals.
+        """
+        principal = self.data('principal')
+        rate = float(self.data('rate')) / 100
+        term = int(self.data('term'))
+        basis = self.data('day count')
+        monthly_payment = self.data('monthly payment')
+        first_payment = self.as_date(self.data('first payment'))
+        extras = self.get_extra_payment_vector(term) if extra_payments else None
+
+        payment = monthly_payment
+        accrued = 0
+        total_interest = 0
+        total = 0
+        last_month = None
+        made = 0
+        period = 0
+        start = self.as_date(self.data('origination'))
+        try:
+            while made < term and principal > 0:
+                period += 1
+                due = amortization.add_months(first_payment, period - 1, first_payment.day)
+                interest = 0
+                events = self._interest_events(start, due)
+                for event in sorted(set(events + [due])):
+                    accrual = round(principal * rate * amortization.year_fraction(start, event, basis), 2)
+                    interest += accrual
+                    accrued += accrual
+                    start = event
+                    if event in events:
+                        principal = round(principal + accrued, 2)
+                        accrued = 0
+                        payment = float(amortization.monthly_payment(principal, rate / 12, term - made))
+                interest = round(interest, 2)
+                total_interest += interest
+
+                extra = 0
+                if any(first <= due <= last for first, last in self._deferments):
+                    total += interest + principal
+                    yield period, principal, interest, extra
+                    continue
+
+                made += 1
+                if extra_payments and period <= term:
+                    extra = extras[period]
+                amount = payment + extra if made < term else principal + accrued
+                principal = round(principal + accrued - amount, 2)
+                accrued = 0
+                if principal <= 0:
+                    extra -= principal
+                    principal = 0
+                    last_month = period
+                total += extra + interest + principal
+                yield period, principal, interest, extra
+        finally:
+            complete = made >= term or principal <= 0
+            if last_month is None and complete:
+                last_month = period
+            summary.update({
+                'total': round(total, 2),
+                'total interest': round(total_interest, 2),
+                'monthly payment': monthly_payment,
+                'last month': last_month,
+                'months': period,
+                'complete': complete
+            })
+
     def get_editable(self, root, name: str = None, desc: str = None) -> tuple:
-        super().get_editable(root, 'School', 'Degree')
+        frame, index = super().get_editable(root, 'School', 'Degree')
+        index = self.tk_editable_dropdown('day count', 'Day Count', ['actual/365', 'actual/actual'], frame, index)
+
+        return frame, index
 
 
 class Personal(Loan):
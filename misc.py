@@ -2,10 +2,13 @@
 # GitHub username: hobstowler
 # Date: 3/11/2022
 # Description:
+import threading
 import tkinter
 import tkinter as tk
 from tkinter import E, W
 
+import amortization
+
 
 class Expense:
     """
@@ -90,6 +93,42 @@ class ExtraPayment:
         return jsonification
 
 
+class Offer:
+    """Class representing a lender's offer for a loan. Has a rate, points, fees, term and PMI rate."""
+    def __init__(self, lender: str, rate: float, term: int = 360, points: float = 0, fees: float = 0,
+                 pmi_rate: float = 0) -> None:
+        """
+        Initializes the offer.
+        :param lender: The name of the lender.
+        :param rate: The annual rate as a percentage.
+        :param term: The term in months.
+        :param points: The points paid up front, as a percentage of the principal.
+        :param fees: The closing fees.
+        :param pmi_rate: The annual PMI rate as a percentage of the principal.
+        """
+        self.lender = lender
+        self.rate = rate
+        self.term = term
+        self.points = points
+        self.fees = fees
+        self.pmi_rate = pmi_rate
+
+    def get_jsonification(self) -> dict:
+        """
+        Returns a JSON-friendly version of this offer.
+        :return: A dict object representing this object.
+        """
+        jsonification = {
+            'lender': self.lender,
+            'rate': self.rate,
+            'term': self.term,
+            'points': self.points,
+            'fees': self.fees,
+            'pmi rate': self.pmi_rate
+        }
+        return jsonification
+
+
 class Window:
     def __init__(self, root, parent, fin_obj, title=None):
         self._fin_obj = fin_obj
@@ -123,19 +162,14 @@ class ExpenseWindow(Window):
 
     def new_expense(self):
         new_expense = Expense(self._desc.get(), self._amount.get())
-        expense_list = self._fin_obj.get_expenses()
-
-        if new_expense not in expense_list:
-            expense_list.append(new_expense)
+        self._fin_obj.add_expense(new_expense)
         self._desc.set("")
         self._amount.set(0)
 
         self.populate()
 
     def delete_expense(self, expense):
-        expense_list = self._fin_obj.get_expenses()
-        if expense in expense_list:
-            expense_list.remove(expense)
+        self._fin_obj.rem_expense(expense)
 
         self.populate()
 
@@ -250,18 +284,13 @@ class BracketWindow(Window):
         # todo logic for a valid bracket--cannot overlap
         # todo blank out on click/focus to prevent weird errors with leading zeros
         new_bracket = Bracket(self._rate.get(), self._upper.get())
-        bracket_list = self._fin_obj.get_brackets()
-        if new_bracket not in bracket_list:
-            bracket_list.append(new_bracket)
-            bracket_list.sort(key=lambda x: x.upper)
+        self._fin_obj.add_bracket(new_bracket)
         self._rate.set(0.0)
         self._upper.set(0.0)
         self.populate()
 
     def delete_bracket(self, bracket) -> None:
-        bracket_list = self._fin_obj.get_brackets()
-        if bracket in bracket_list:
-            bracket_list.remove(bracket)
+        self._fin_obj.rem_bracket(bracket)
         self.populate()
 
     def populate(self) -> None:
@@ -328,13 +357,12 @@ class ExtraPaymentWindow(Window):
         super().__init__(root, parent, loan, title)
 
     def new_extra_payment(self):
-        extra_payments = self._fin_obj.get_extra_payments()
         try:
             if self._start.get() == 0 or self._duration.get() == 0 or self._amount.get() == 0:
                 ErrorBox(self._root, "invalid inputs")
             else:
                 new_extra_payment = ExtraPayment(self._start.get(), self._duration.get(), self._amount.get())
-                extra_payments.append(new_extra_payment)
+                self._fin_obj.add_extra_payment(new_extra_payment)
             self.populate()
         except tkinter.TclError:
             ErrorBox(self._root, "invalid inputs")
@@ -343,9 +371,7 @@ class ExtraPaymentWindow(Window):
         self._amount.set(0)
 
     def delete_extra_payment(self, extra_payment):
-        extra_payments = self._fin_obj.get_extra_payments()
-        if extra_payment in extra_payments:
-            extra_payments.remove(extra_payment)
+        self._fin_obj.rem_extra_payment(extra_payment)
         self.populate()
 
     def populate(self):
@@ -379,6 +405,143 @@ class ExtraPaymentWindow(Window):
             last += 1
 
 
+class OfferComparisonWindow(Window):
+    """
+    Class representing a window interface for adding lender offers to a Mortgage and ranking them. Offers are ranked on
+    a background thread so large offer sets do not freeze the window.
+    """
+    poll_interval = 100
+
+    def __init__(self, root, parent, mortgage):
+        title = "Compare Offers"
+        self._mortgage = mortgage
+        self._ranking = None
+        self._worker = None
+        self._results = []
+        self._generation = 0
+
+        self._lender = tk.StringVar()
+        self._rate = tk.DoubleVar()
+        self._term = tk.IntVar(value=360)
+        self._points = tk.DoubleVar()
+        self._fees = tk.DoubleVar()
+        self._pmi_rate = tk.DoubleVar()
+        super().__init__(root, parent, mortgage, title)
+
+    def new_offer(self):
+        try:
+            if self._rate.get() <= 0 or self._term.get() <= 0:
+                ErrorBox(self._root, "invalid inputs")
+            else:
+                offer = Offer(self._lender.get(), self._rate.get(), self._term.get(), self._points.get(),
+                              self._fees.get(), self._pmi_rate.get())
+                self._fin_obj.add_offer(offer)
+                self._ranking = None
+                self._generation += 1
+            self.populate()
+        except tkinter.TclError:
+            ErrorBox(self._root, "invalid inputs")
+
+    def delete_offer(self, offer):
+        self._fin_obj.rem_offer(offer)
+        self._ranking = None
+        self._generation += 1
+        self.populate()
+
+    def rank(self):
+        """
+        Starts ranking the offers on a background thread and polls for the result from the Tk event loop. The offers
+        and the mortgage's principal and value are copied here on the Tk thread, so the worker never reads or writes the
+        mortgage, and every chunk is ranked in the worker thread rather than a process pool.
+        """
+        if self._worker is not None and self._worker.is_alive():
+            return
+        mortgage = self._mortgage
+        args = (self._generation, mortgage.calc_principal(), mortgage.data('total'), list(mortgage.get_offers()),
+                mortgage.assume('pmi cancellation ltv'))
+        self._results = []
+        self._worker = threading.Thread(target=self.run_ranking, args=args, daemon=True)
+        self._worker.start()
+        self.populate()
+        self._window.after(self.poll_interval, self.poll)
+
+    def run_ranking(self, generation: int, principal, value, offers: list, pmi_ltv):
+        """
+        Ranks a snapshot of the offers on the background thread. The result or error is kept with the generation of
+        the offers it was started for, so poll can report it from the Tk event loop.
+        """
+        try:
+            self._results.append((generation, amortization.rank_offers(principal, value, offers, pmi_ltv, workers=1),
+                                  None))
+        except Exception as error:
+            self._results.append((generation, None, error))
+
+    def poll(self):
+        """
+        Displays the ranking once the background thread finishes, otherwise checks again after the poll interval.
+        Results for an offer set that has changed since the ranking started are discarded.
+        """
+        if self._worker.is_alive():
+            self._window.after(self.poll_interval, self.poll)
+            return
+        generation, ranking, error = self._results[0] if self._results else (None, None, None)
+        if generation == self._generation:
+            if error is not None:
+                ErrorBox(self._root, f"ranking failed: {error}")
+            else:
+                self._ranking = ranking
+        self.populate()
+
+    def populate(self):
+        for c in self._frame.winfo_children():
+            c.destroy()
+
+        frame = self._frame
+        offers = self._mortgage.get_offers()
+
+        tk.Label(frame, text=self._mortgage.name().title()).grid(column=0, row=0, columnspan=7)
+        tk.Label(frame, text="").grid(column=0, row=1)
+
+        fields = [('Lender', self._lender), ('Rate', self._rate), ('Term', self._term), ('Points', self._points),
+                  ('Fees', self._fees), ('PMI Rate', self._pmi_rate)]
+        for i, (text, var) in enumerate(fields):
+            tk.Label(frame, text=text).grid(column=i, row=2)
+            tk.Entry(frame, textvariable=var, width=10).grid(column=i, row=3)
+        add_button = tk.Button(frame, text='Add', width=6)
+        add_button.grid(column=6, row=3, sticky=W+E)
+        add_button.bind("<Button-1>", lambda e: self.new_offer())
+
+        row = 4
+        for offer in offers:
+            values = (offer.lender, offer.rate, offer.term, offer.points, offer.fees, offer.pmi_rate)
+            for i, value in enumerate(values):
+                tk.Label(frame, text=value).grid(column=i, row=row, sticky=W+E)
+            del_button = tk.Button(frame, text="Delete", width=6)
+            del_button.bind("<Button-1>", lambda e, o=offer: self.delete_offer(o))
+            del_button.grid(column=6, row=row, sticky=W+E)
+            row += 1
+
+        running = self._worker is not None and self._worker.is_alive()
+        rank_button = tk.Button(frame, text='Ranking...' if running else 'Rank Offers')
+        rank_button.grid(column=0, row=row, columnspan=7, sticky=W+E, pady=(10, 0))
+        rank_button.bind("<Button-1>", lambda e: self.rank())
+        row += 1
+
+        if self._ranking:
+            headings = ('Lender', 'Payment', 'Up Front', 'Total Cost', 'Break Even')
+            for i, text in enumerate(headings):
+                tk.Label(frame, text=text).grid(column=i, row=row, sticky=W+E)
+            row += 1
+            for result in self._ranking:
+                break_even = result.get('break even')
+                values = (result.get('offer').lender, f'${result.get("monthly payment"):,.2f}',
+                          f'${result.get("upfront"):,.2f}', f'${result.get("total cost"):,.2f}',
+                          '-' if break_even is None else f'Month {break_even}')
+                for i, value in enumerate(values):
+                    tk.Label(frame, text=value).grid(column=i, row=row, sticky=W+E)
+                row += 1
+
+
 class AssumptionsWindow(Window):
     def __init__(self, root, parent, fin_obj):
         self._form_vars = {}
@@ -431,17 +594,16 @@ class Selector(Window):
 class ExpenseSelector(Selector):
     def __init__(self, root, parent, expenses):
         self._all_expenses: list = parent.get_fin_vars('expenses')
+        self._deductions = expenses
         self._expenses: list = expenses.get_expenses()
         super().__init__(root, parent, expenses)
 
     def add_remove_expense(self, expense, check_var):
         val = check_var.get()
         if val == 1:
-            if expense not in self._expenses:
-                self._taxes.append(expense)
+            self._deductions.add_expense(expense)
         else:
-            if expense in self._expenses:
-                self._taxes.remove(expense)
+            self._deductions.rem_expense(expense)
 
     def populate(self):
         for c in self._frame.winfo_children():
@@ -2,6 +2,7 @@
 # Date: 12/1/2021
 # Description:
 
+import amortization
 from income import *
 from loans import *
 
@@ -164,6 +165,16 @@ class Scenario(FinanceObj):
             return True
         return False
 
+    def simulate_debt_payoff(self, budgets, strategy: str = 'avalanche', priority: list = None) -> list:
+        """
+        Simulates paying off the scenario's loans together, rolling the payment of each paid off loan into the next one.
+        :param budgets: The monthly budgets to simulate.
+        :param strategy: 'avalanche', 'snowball' or 'custom'. See amortization.household_payoff.
+        :param priority: The loans in priority order, for the 'custom' strategy.
+        :return: A list with the simulation result of each budget.
+        """
+        return amortization.household_payoff(self._loans, budgets, strategy, priority)
+
     def _calculate(self):
         """
         Calculates weekly, monthly, and annual amounts and schedules.
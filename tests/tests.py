@@ -1,4 +1,563 @@
 from tkinter import *
 from tkinter import ttk
+import sys
+import tkinter
+import unittest
 
+import amortization
+import numpy as np
+from matplotlib import pyplot
+from datetime import date
 
+from loans import Loan, Mortgage, Student, VariableRateMortgage
+from income import Job, TaxBracket
+from misc import Bracket, Expense, ExtraPayment, Offer
+
+
+class TestAmortization(unittest.TestCase):
+    def setUp(self):
+        self.loan = Loan(None, 'test loan', 'test description')
+        self.loan.add_extra_payment(ExtraPayment(5, 24, 1000))
+        self.loan.add_extra_payment(ExtraPayment(60, 24, 1000))
+        self.loan.add_extra_payment(ExtraPayment(100, 1, 25000))
+
+    def test_numpy_engine_matches_loop(self):
+        for extra_payments in (False, True):
+            loop = self.loan.amortization_schedule(extra_payments)
+            arrays = self.loan.amortization_schedule(extra_payments, engine='numpy')
+            schedule = loop.get('schedule')
+            self.assertEqual(schedule, arrays.get('schedule'))
+            self.assertTrue(np.shares_memory(arrays.get('balance'), schedule.array('balance')))
+
+            extras = self.loan.get_extra_payment_vector(360) if extra_payments else np.zeros(361)
+            batch = amortization.amortize([self.loan.data('principal')], [self.loan.periodic_rate()],
+                                          [self.loan.periodic_payment()], extras[None, :], 360)
+            self.assertEqual(loop.get('total'), batch.get('total')[0])
+            self.assertEqual(loop.get('total interest'), batch.get('total interest')[0])
+            self.assertEqual(loop.get('last month'), batch.get('last month')[0])
+            self.assertEqual([row[1] for row in schedule], list(batch.get('balance')[0]))
+            self.assertEqual([row[2] for row in schedule], list(batch.get('interest')[0]))
+            self.assertEqual([row[3] for row in schedule], list(batch.get('extra')[0]))
+
+    def test_extra_payment_vector_invalidation(self):
+        vector = self.loan.get_extra_payment_vector(360)
+        self.assertEqual([0, 1000, 1000, 0], list(vector[[4, 5, 28, 29]]))
+        self.assertEqual(25000, vector[100])
+        lump_sum = self.loan.get_extra_payments()[2]
+        self.loan.rem_extra_payment(lump_sum)
+        self.assertEqual(0, self.loan.get_extra_payment_vector(360)[100])
+
+    def test_schedule_cache(self):
+        cache = Loan.schedule_cache
+        cache.clear()
+        first = self.loan.amortization_schedule(True)
+        self.assertIs(first, self.loan.amortization_schedule(True))
+        self.assertEqual({'hits': 1, 'misses': 1}, {k: cache.stats().get(k) for k in ('hits', 'misses')})
+
+        self.loan.invalidate()
+        self.assertIsNot(first, self.loan.amortization_schedule(True))
+        self.assertEqual(2, cache.misses)
+
+    def test_incremental_reamortization(self):
+        self.loan.amortization_schedule(True)
+        self.loan.add_extra_payment(ExtraPayment(200, 12, 500))
+        resumed = self.loan.amortization_schedule(True)
+
+        fresh = Loan(None, 'fresh loan')
+        for e in self.loan.get_extra_payments():
+            fresh.add_extra_payment(e)
+        expected = fresh.amortization_schedule(True)
+        self.assertEqual(expected.get('schedule'), resumed.get('schedule'))
+        self.assertEqual(expected.get('total'), resumed.get('total'))
+        self.assertEqual(expected.get('last month'), resumed.get('last month'))
+
+    def test_point_in_time_queries(self):
+        loan = Loan(None, 'dated loan')
+        loan.add_extra_payment(ExtraPayment(5, 24, 1000))
+        cases = [(date(2020, 1, 15), 0), ('2020-02-01', 1), (date(2021, 1, 31), 12), ('2021-02-01', 13),
+                 (100, 100), ('2048-12-31', 347), (date(2060, 1, 1), 360), (400, 360)]
+        for when, month in cases:
+            self.assertEqual(month, loan.month_of(when))
+
+        for extra_payments in (False, True):
+            rows = loan.amortization_schedule(extra_payments).get('schedule')
+            for when, month in cases:
+                interest = sum(row[2] for row in rows[1:month + 1])
+                self.assertAlmostEqual(rows[month][1], loan.balance_at(when, extra_payments), delta=0.25)
+                self.assertAlmostEqual(interest, loan.interest_through(when, extra_payments), delta=0.25)
+                self.assertAlmostEqual(loan.data('total') - rows[month][1], loan.equity_at(when, extra_payments),
+                                       delta=0.25)
+        self.assertEqual(160000, loan.balance_at('2019-06-01'))
+        self.assertEqual(80000, loan.equity_at(date(2019, 6, 1)))
+        self.assertEqual(0, loan.balance_at('2060-01-01', True))
+        self.assertEqual(240000, loan.equity_at(date(2060, 1, 1)))
+
+    def test_closed_form_payoff(self):
+        for extra_payments in (False, True):
+            schedule = self.loan.amortization_schedule(extra_payments)
+            summary = self.loan.payoff_summary(extra_payments)
+            self.assertEqual(schedule.get('last month'), summary.get('last month'))
+            self.assertAlmostEqual(schedule.get('total interest'), summary.get('total interest'), delta=1)
+
+    def test_cents_engine(self):
+        for extra_payments in (False, True):
+            loop = self.loan.amortization_schedule(extra_payments)
+            cents = self.loan.amortization_schedule(extra_payments, engine='cents')
+            self.assertEqual(loop.get('last month'), cents.get('last month'))
+            self.assertAlmostEqual(loop.get('total interest'), cents.get('total interest'), delta=1)
+            for row in cents.get('schedule'):
+                self.assertEqual(round(row[1], 2), row[1])
+
+        self.assertEqual(3, amortization.divide_cents(25, 10, 'half up'))
+        self.assertEqual(2, amortization.divide_cents(25, 10, 'half even'))
+        self.assertEqual(2, amortization.divide_cents(29, 10, 'down'))
+
+    def test_columnar_schedule(self):
+        schedule = Loan(None, 'plain loan').amortization_schedule(False).get('schedule')
+        rows = schedule.rows()
+        row_bytes = sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(map(sys.getsizeof, row)) for row in rows)
+        self.assertEqual(361, len(schedule))
+        self.assertEqual(361 * (4 + 8 + 8 + 8), schedule.nbytes())
+        self.assertLess(schedule.nbytes() * 5, row_bytes)
+
+        for name in amortization.Schedule.columns:
+            column = schedule.column(name)
+            self.assertIs(column, schedule.column(name))
+            self.assertTrue(np.shares_memory(schedule.array(name), np.frombuffer(column, dtype=column.typecode)))
+        with self.assertRaises(ValueError):
+            schedule.array('balance')[0] += 1
+
+    def test_shared_schedule_is_read_only(self):
+        first, second = Loan(None, 'first loan'), Loan(None, 'second loan')
+        self.assertEqual(first.schedule_fingerprint(), second.schedule_fingerprint())
+        balance = second.amortization_schedule().get('schedule')[12][1]
+        for engine in ('python', 'numpy'):
+            schedule = first.amortization_schedule(engine=engine)
+            for name in ('balance', 'interest', 'extra'):
+                with self.assertRaises(ValueError):
+                    first.monthly_arrays().get(name)[1] *= 0
+                with self.assertRaises(ValueError):
+                    schedule.get('schedule').array(name)[1] *= 0
+            if engine == 'numpy':
+                with self.assertRaises(ValueError):
+                    schedule.get('balance')[12] *= 0
+        self.assertEqual(balance, second.amortization_schedule().get('schedule')[12][1])
+        self.assertAlmostEqual(balance, second.balance_at(12), delta=0.05)
+
+    def test_schedule_stream(self):
+        stream = self.loan.iter_schedule(True)
+        self.assertIsNone(stream.summary)
+        rows = [list(row) for row in stream]
+        schedule = self.loan.amortization_schedule(True)
+        self.assertEqual(schedule.get('schedule').rows(), rows)
+        self.assertEqual(schedule.get('total interest'), stream.summary.get('total interest'))
+        self.assertEqual(schedule.get('last month'), stream.summary.get('last month'))
+
+        stream = self.loan.iter_schedule(True, months=24)
+        self.assertEqual(25, len(list(stream)))
+        self.assertFalse(stream.summary.get('complete'))
+        self.assertEqual(round(sum(row[2] for row in rows[:25]), 2), stream.summary.get('total interest'))
+
+    def test_portfolio_matches_individual_loans(self):
+        short = Loan(None, 'short loan')
+        short.get_data().update({'term': 120, 'rate': 6.5})
+        short.calc_monthly()
+        bi_weekly = Loan(None, 'bi-weekly loan')
+        bi_weekly.get_data().update({'payment frequency': 'Bi-Weekly'})
+        bi_weekly.add_extra_payment(ExtraPayment(12, 12, 500))
+        loans = [self.loan, short, bi_weekly]
+
+        for chunk_size in (1, 3):
+            portfolio = amortization.amortize_portfolio(loans, chunk_size=chunk_size, keep_schedules=True)
+            per_loan = portfolio.get('loans')
+            for i, loan in enumerate(loans):
+                schedule = loan.amortization_schedule(True)
+                term = loan.period_count()
+                self.assertEqual(schedule.get('total interest'), per_loan.get('total interest')[i])
+                self.assertEqual(schedule.get('last month'), per_loan.get('last month')[i])
+                self.assertEqual([row[1] for row in schedule.get('schedule')],
+                                 list(per_loan.get('balance')[i][:term + 1]))
+
+            flows = portfolio.get('portfolio')
+            self.assertEqual(361, len(flows.get('interest')))
+            self.assertAlmostEqual(sum(per_loan.get('total interest')), flows.get('interest').sum(), places=2)
+            balance = np.zeros(361)
+            for loan in loans:
+                monthly = loan.monthly_arrays(True).get('balance')
+                balance[:len(monthly)] += monthly
+            self.assertTrue(np.allclose(balance, flows.get('balance')))
+
+        totals = amortization.amortize_portfolio(loans).get('loans')
+        self.assertNotIn('balance', totals)
+        self.assertEqual(list(per_loan.get('total interest')), list(totals.get('total interest')))
+
+    def test_variable_rate_mortgage(self):
+        arm = VariableRateMortgage(None, 'test arm')
+        arm.get_data().update({'margin': 0, 'rate floor': 0})
+        arm.set_index_path([arm.data('rate')])
+        fixed = Loan(None, 'fixed loan')
+        self.assertEqual(fixed.amortization_schedule().get('schedule'), arm.amortization_schedule().get('schedule'))
+
+        arm.get_data().update({'margin': 2.75, 'rate floor': 2.75})
+        arm.set_index_path([1, 3, 9, 9, 9, 2])
+        rates = [rate for start, end, rate in arm.rate_segments()]
+        self.assertEqual([2.875, 3.75, 5.75, 7.75, 7.875, 7.875, 5.875, 4.75], rates[:8])
+        self.assertEqual(61, min(arm.rate_resets()))
+
+        arm.add_extra_payment(ExtraPayment(70, 24, 1000))
+        for extra_payments in (False, True):
+            schedule = arm.amortization_schedule(extra_payments)
+            summary = arm.payoff_summary(extra_payments)
+            self.assertEqual(schedule.get('last month'), summary.get('last month'))
+            self.assertAlmostEqual(schedule.get('total interest'), summary.get('total interest'), delta=5)
+            self.assertAlmostEqual(schedule.get('schedule')[120][1], arm.balance_at(120, extra_payments), delta=1)
+        with self.assertRaises(ValueError):
+            arm.amortization_schedule(engine='numpy')
+
+    def test_rate_path_simulation(self):
+        arm = VariableRateMortgage(None, 'test arm')
+        inline = arm.simulate(paths=600, seed=7, workers=1, chunk_size=100)
+        pooled = arm.simulate(paths=600, seed=7, workers=2, chunk_size=100)
+        self.assertEqual(inline.get('payment').tolist(), pooled.get('payment').tolist())
+        self.assertEqual(inline.get('total interest').tolist(), pooled.get('total interest').tolist())
+
+        payment = inline.get('payment')
+        self.assertEqual((5, 361), payment.shape)
+        self.assertTrue((payment[:, 1:61] == arm.data('monthly payment')).all())
+        self.assertTrue((payment[:-1] <= payment[1:]).all())
+        self.assertTrue((inline.get('total interest')[:-1] <= inline.get('total interest')[1:]).all())
+
+        arm.set_index_path([arm.assume('index rate')])
+        fixed_path = arm.simulate(paths=10, volatility=0, workers=1)
+        self.assertAlmostEqual(arm.payoff_summary().get('total interest'), fixed_path.get('total interest')[2],
+                               delta=5)
+
+    def test_escrow_timeline(self):
+        mortgage = Mortgage(None, 'test mortgage')
+        mortgage.get_data().update({'down payment': 20000})
+        total_monthly = mortgage.calc_total_monthly()
+        timeline = mortgage.escrow_timeline()
+        self.assertEqual(total_monthly, timeline.get('total monthly')[1])
+        self.assertEqual(total_monthly, mortgage.calc_total_monthly(1))
+        self.assertEqual(mortgage.data('escrow'), mortgage.calc_escrow(12))
+        self.assertLess(timeline.get('property tax')[12], timeline.get('property tax')[13])
+
+        balance = mortgage.amortization_schedule(engine='numpy').get('schedule').array('balance')
+        threshold = mortgage.data('total') * 0.78
+        cancellation = timeline.get('pmi cancellation month')
+        self.assertGreater(balance[cancellation - 2], threshold)
+        self.assertLessEqual(balance[cancellation - 1], threshold)
+        self.assertEqual(mortgage.data('pmi'), timeline.get('pmi')[cancellation - 1])
+        self.assertEqual(0, timeline.get('pmi')[cancellation:].sum())
+
+        mortgage.get_data().update({'down payment': 80000})
+        mortgage.calc_principal()
+        mortgage.invalidate()
+        self.assertIsNone(mortgage.escrow_timeline().get('pmi cancellation month'))
+
+    def test_compare_plans(self):
+        mortgage = Mortgage(None, 'test mortgage')
+        mortgage.add_plan('monthly', mortgage.monthly_extra_plan(200))
+        mortgage.add_plan('yearly', mortgage.lump_sum_plan(2400))
+        mortgage.add_plan('late', [ExtraPayment(300, 1, 5000)])
+        mortgage.add_plan('removed', mortgage.monthly_extra_plan(5000))
+        self.assertTrue(mortgage.rem_plan('removed'))
+        ranking = mortgage.compare_plans(mortgage.get_plans())
+
+        self.assertEqual(['monthly', 'yearly', 'late'], [r.get('plan') for r in ranking])
+        saved = [r.get('interest saved') for r in ranking]
+        self.assertEqual(sorted(saved, reverse=True), saved)
+        base = mortgage.amortization_schedule()
+        for result in ranking:
+            loan = Mortgage(None, 'plan mortgage')
+            for extra_payment in mortgage.get_plans().get(result.get('plan')):
+                loan.add_extra_payment(extra_payment)
+            schedule = loan.amortization_schedule(True)
+            months_saved = base.get('last month') - schedule.get('last month')
+            self.assertEqual(schedule.get('last month'), result.get('last month'))
+            self.assertEqual(schedule.get('total interest'), result.get('total interest'))
+            self.assertAlmostEqual(base.get('total interest') - schedule.get('total interest'),
+                                   result.get('interest saved'), places=2)
+            self.assertEqual(months_saved, result.get('total months saved'))
+            self.assertEqual(months_saved, 12 * result.get('years saved') + result.get('months saved'))
+        self.assertEqual(5000, ranking[2].get('total extra'))
+
+    def test_sensitivity_grid(self):
+        mortgage = Mortgage(None, 'test mortgage')
+        data = dict(mortgage.get_data())
+        rates, terms, down_payments = [3, 5.5], [180, 360], [10000, 40000, 60000]
+        grid = mortgage.sensitivity_grid(rates, terms, down_payments)
+        self.assertEqual(data, mortgage.get_data())
+        for name in ('monthly payment', 'pmi', 'escrow', 'total monthly', 'total interest'):
+            self.assertEqual((2, 2, 3), grid.get(name).shape)
+
+        for i, j, k in ((0, 0, 0), (1, 1, 1), (1, 0, 2), (0, 1, 2)):
+            point = Mortgage(None, 'point mortgage')
+            point.get_data().update({'rate': rates[i], 'term': terms[j], 'down payment': down_payments[k]})
+            monthly = point.calc_monthly()
+            self.assertEqual(monthly, grid.get('monthly payment')[i, j, k])
+            self.assertEqual(point.calc_PMI(), grid.get('pmi')[i, j, k])
+            self.assertEqual(point.calc_escrow(), grid.get('escrow')[i, j, k])
+            self.assertEqual(round(monthly + point.calc_escrow(), 2), grid.get('total monthly')[i, j, k])
+
+    def test_rank_offers(self):
+        mortgage = Mortgage(None, 'test mortgage')
+        mortgage.get_data().update({'down payment': 20000})
+        mortgage.calc_total_monthly()
+        current = Offer('current', mortgage.data('rate'), mortgage.data('term'), 0, 0, mortgage.assume('pmi rate'))
+        offers = [current, Offer('points', 2.5, 360, 2, 2000, 0.5), Offer('short', 2.5, 180, 0, 1000, 0.4)]
+
+        ranking = mortgage.rank_offers(offers, workers=1)
+        self.assertEqual(['short', 'points', 'current'], [r.get('offer').lender for r in ranking])
+        result = ranking[2]
+        self.assertEqual(mortgage.data('monthly payment'), result.get('monthly payment'))
+        self.assertEqual(mortgage.escrow_timeline().get('pmi cancellation month') - 1, result.get('pmi months'))
+        self.assertEqual(0, result.get('break even'))
+        self.assertGreater(ranking[1].get('break even'), 12)
+
+        pooled = amortization.rank_offers(mortgage.data('principal'), mortgage.data('total'), offers * 3,
+                                          chunk_size=2, workers=2)
+        inline = amortization.rank_offers(mortgage.data('principal'), mortgage.data('total'), offers * 3,
+                                          chunk_size=2, workers=1)
+        self.assertEqual([r.get('total cost') for r in inline], [r.get('total cost') for r in pooled])
+        self.assertEqual([r.get('break even') for r in inline], [r.get('break even') for r in pooled])
+
+    def test_refinance_analysis(self):
+        mortgage = Mortgage(None, 'test mortgage')
+        mortgage.get_data().update({'rate': 6.5})
+        mortgage.calc_monthly()
+        offers = [Offer('lower', 5, 360, 1, 3000), Offer('higher', 7, 360)]
+        analysis = mortgage.refinance_analysis(offers)
+        self.assertEqual((2, 359), analysis.get('lifetime savings').shape)
+
+        month = 60
+        balance = mortgage.balance_at(month)
+        refinanced = Loan(None, 'refinanced')
+        refinanced.get_data().update({'total': balance, 'down payment': 0, 'rate': 5, 'term': 360})
+        refinanced.calc_monthly()
+        schedule = mortgage.amortization_schedule(engine='numpy')
+        savings = sum(schedule.get('interest')[month + 1:]) - refinanced.payoff_summary().get('total interest') - \
+            (balance * 0.01 + 3000)
+        self.assertEqual(refinanced.data('monthly payment'), analysis.get('monthly payment')[0, month - 1])
+        self.assertAlmostEqual(savings, analysis.get('lifetime savings')[0, month - 1], delta=10)
+        self.assertTrue(0 < analysis.get('break even')[0, month - 1] < 60)
+        self.assertTrue((analysis.get('break even')[1] == -1).all())
+        self.assertEqual(1, analysis.get('best month')[0])
+
+    def test_household_payoff(self):
+        def loan(principal, rate, term):
+            debt = Loan(None, 'debt')
+            debt.get_data().update({'total': principal, 'down payment': 0, 'rate': rate, 'term': term})
+            debt.calc_monthly()
+            return debt
+
+        car, card = loan(25000, 6.9, 60), loan(8000, 11.9, 36)
+        alone = amortization.household_payoff([car], [car.data('monthly payment')])[0]
+        self.assertEqual(car.payoff_summary().get('last month'), alone.get('last month'))
+        self.assertAlmostEqual(car.payoff_summary().get('total interest'), alone.get('total interest'), places=2)
+
+        loans = [car, card]
+        budgets = [car.data('monthly payment') + card.data('monthly payment') + extra for extra in (0, 500)]
+        avalanche = amortization.household_payoff(loans, budgets, 'avalanche')
+        custom = amortization.household_payoff(loans, budgets, 'custom', [car])
+        self.assertEqual([card, car], avalanche[0].get('order'))
+        self.assertEqual([car, card], custom[0].get('order'))
+        self.assertEqual(36, avalanche[0].get('payoff month')[1])
+        self.assertLess(avalanche[0].get('payoff month')[0], 60)
+        self.assertLess(avalanche[1].get('total interest'), custom[1].get('total interest'))
+        self.assertLess(avalanche[1].get('last month'), avalanche[0].get('last month'))
+
+        result = avalanche[1]
+        self.assertAlmostEqual(budgets[1], result.get('payment')[1], places=6)
+        self.assertAlmostEqual(sum(result.get('payment')), 33000 + result.get('total interest'), places=1)
+        with self.assertRaises(ValueError):
+            amortization.household_payoff(loans, [100])
+        with self.assertRaises(ValueError):
+            amortization.household_payoff(loans, budgets, 'custom')
+
+    def test_daily_accrual(self):
+        self.assertEqual(1, amortization.year_fraction(date(2024, 1, 1), date(2025, 1, 1), 'actual/actual'))
+        self.assertEqual(366 / 365, amortization.year_fraction(date(2024, 1, 1), date(2025, 1, 1)))
+        self.assertEqual(date(2024, 2, 29), amortization.add_months(date(2024, 1, 31), 1))
+
+        student = Student(None, 'test student loan')
+        monthly = student.amortization_schedule(engine='python')
+        daily = student.amortization_schedule()
+        self.assertEqual(set(monthly.keys()), set(daily.keys()))
+        self.assertEqual(len(monthly.get('schedule')), len(daily.get('schedule')))
+        self.assertEqual(360, daily.get('last month'))
+        self.assertAlmostEqual(monthly.get('total interest'), daily.get('total interest'), delta=200)
+        first = daily.get('schedule')[1]
+        self.assertEqual(round(student.data('principal') * 0.02875 * 31 / 365, 2), first[2])
+
+        student.add_deferment('2025-01-01', '2025-12-31')
+        deferred = student.amortization_schedule()
+        schedule = deferred.get('schedule')
+        self.assertEqual(372, deferred.get('last month'))
+        self.assertEqual(schedule[60][1], schedule[71][1])
+        capitalized = schedule[59][1] + sum(schedule.column('interest')[60:73])
+        payment = float(amortization.monthly_payment(round(capitalized, 2), 0.02875 / 12, 301))
+        self.assertAlmostEqual(capitalized - payment, schedule[72][1], places=2)
+
+        student.add_extra_payment(ExtraPayment(24, 12, 1000))
+        for extra_payments in (False, True):
+            daily = student.amortization_schedule(extra_payments)
+            schedule = daily.get('schedule')
+            stream = student.iter_schedule(extra_payments)
+            self.assertEqual(schedule.rows()[:daily.get('last month') + 1], [list(row) for row in stream])
+            self.assertEqual(daily.get('total interest'), stream.summary.get('total interest'))
+            self.assertEqual(daily.get('last month'), stream.summary.get('last month'))
+            summary = student.payoff_summary(extra_payments)
+            self.assertEqual(daily.get('last month'), summary.get('last month'))
+            self.assertEqual(daily.get('total interest'), summary.get('total interest'))
+            for month in (0, 1, 65, 200, daily.get('last month'), 400):
+                row = min(month, len(schedule) - 1)
+                interest = round(sum(schedule.column('interest')[1:row + 1]), 2)
+                self.assertEqual(round(schedule[row][1], 2), student.balance_at(month, extra_payments))
+                self.assertEqual(interest, student.interest_through(month, extra_payments))
+        self.assertEqual(student.balance_at(65), student.balance_at('2025-06-01'))
+        self.assertEqual(student.compare_schedules().get('difference'),
+                         student.compare_schedules(schedules=False).get('difference'))
+
+        pyplot.switch_backend('Agg')
+        comparison = student.compare_schedules(display_graph=True)
+        lines = pyplot.gca().get_lines()
+        self.assertEqual(len(comparison.get('extra').get('schedule')), len(lines[1].get_xdata()))
+        self.assertGreater(len(lines[0].get_xdata()), 361)
+        pyplot.close('all')
+
+    def test_payment_frequency(self):
+        monthly = self.loan.amortization_schedule(True)
+        for frequency, periods in (('Semimonthly', 720), ('Bi-Weekly', 780), ('Accelerated Bi-Weekly', 780)):
+            self.loan.get_data().update({'payment frequency': frequency})
+            self.assertEqual(periods, self.loan.period_count())
+            vector = self.loan.get_period_extra_vector()
+            self.assertEqual(periods + 1, len(vector))
+            self.assertEqual(self.loan.get_extra_payment_vector(360).sum(), vector.sum())
+
+            loop = self.loan.amortization_schedule(True)
+            arrays = self.loan.amortization_schedule(True, engine='numpy')
+            cents = self.loan.amortization_schedule(True, engine='cents')
+            self.assertEqual(loop.get('schedule'), arrays.get('schedule'))
+            self.assertEqual(loop.get('last month'), cents.get('last month'))
+            self.assertEqual(loop.get('last month'), self.loan.payoff_summary(True).get('last month'))
+            self.assertLess(loop.get('total interest'), monthly.get('total interest'))
+
+        self.assertEqual(round(self.loan.data('monthly payment') / 2, 2), self.loan.periodic_payment())
+        self.assertLess(loop.get('last month') * 12 // 26, monthly.get('last month') - 12)
+        self.loan.get_data().update({'payment frequency': 'Semimonthly'})
+        self.assertAlmostEqual(self.loan.data('monthly payment'), self.loan.periodic_payment() * 2, delta=1)
+
+        for loan in (Student(None, 'student loan'), VariableRateMortgage(None, 'arm')):
+            loan.get_data().update({'payment frequency': 'Bi-Weekly'})
+            self.assertEqual(12, loan.periods_per_year())
+            self.assertEqual(loan.data('monthly payment'), loan.periodic_payment())
+
+
+class TestTaxes(unittest.TestCase):
+    def setUp(self):
+        self.brackets = TaxBracket(None, 'Federal', 'Single Filer')
+        for rate, upper in ((10, 9950), (12, 40525), (22, 86375), (24, 164925), (32, 209425), (35, 523600),
+                            (37, 1000000000)):
+            self.brackets.add_bracket(Bracket(rate, upper))
+
+    def loop_tax(self, income):
+        brackets = self.brackets.get_brackets()
+        taxed_amount = 0
+        for i in range(0, len(brackets)):
+            if i == 0:
+                taxed_amount += min(income, brackets[i].upper) * brackets[i].rate / 100
+            else:
+                lower_range = brackets[i - 1].upper + 0.01
+                if income >= brackets[i].upper:
+                    taxed_amount += (brackets[i].upper - lower_range) * brackets[i].rate / 100
+                elif lower_range < income < brackets[i].upper:
+                    taxed_amount += (income - lower_range) * brackets[i].rate / 100
+        return round(taxed_amount, 2)
+
+    def test_compiled_table_matches_loop(self):
+        incomes = [0, 1, 9950, 9950.005, 9950.01, 9950.02, 40525, 55000.37, 86375, 250000, 523600.01, 2000000]
+        incomes += [i * 997.13 for i in range(700)]
+        for income in incomes:
+            self.assertEqual(self.loop_tax(income), self.brackets.calculate_taxed_amount(income)[0])
+        self.assertEqual((0, 0), self.brackets.calculate_taxed_amount(0))
+        self.assertEqual((0, 0), TaxBracket(None, 'empty').calculate_taxed_amount(50000))
+
+    def test_batch_matches_scalar(self):
+        incomes = [0, 1, 9950, 9950.005, 9950.01, 40525, 55000.37, 250000, 2000000] + [i * 123.457 for i in range(5000)]
+        taxed_amounts, effective_rates = self.brackets.calculate_taxed_amounts(incomes)
+        for income, taxed_amount, effective_rate in zip(incomes, taxed_amounts, effective_rates):
+            self.assertEqual(self.brackets.calculate_taxed_amount(income), (taxed_amount, effective_rate))
+
+    def test_table_rebuilt_on_change(self):
+        table = self.brackets.compile()
+        self.assertIs(table, self.brackets.compile())
+        self.brackets.add_range(20000, 11)
+        self.assertEqual(20000, self.brackets.get_brackets()[1].upper)
+        self.assertEqual(self.loop_tax(30000), self.brackets.calculate_taxed_amount(30000)[0])
+        self.assertTrue(self.brackets.rem_range(20000))
+        self.assertEqual(table, self.brackets.compile())
+        self.assertFalse(self.brackets.rem_range(20000))
+
+
+class TestJob(unittest.TestCase):
+    def setUp(self):
+        tkinter._default_root = tkinter.Tcl()
+        self.job = Job(None, 'test job', 'test company')
+        federal = TaxBracket(None, 'Federal', 'Single Filer')
+        for rate, upper in ((10, 9950), (12, 40525), (22, 86375), (24, 164925), (32, 209425), (35, 523600),
+                            (37, 1000000000)):
+            federal.add_bracket(Bracket(rate, upper))
+        state = TaxBracket(None, 'State', 'Single Filer')
+        state._data['type'] = 'State'
+        state.add_bracket(Bracket(3, 20000))
+        state.add_bracket(Bracket(5, 1000000000))
+        self.job._taxes.extend([federal, state])
+        self.job._pre_tax_deductions.add_expense(Expense('health insurance', 2400))
+        self.job._post_tax_deductions.add_expense(Expense('union dues', 600))
+
+    def test_merged_tax_function(self):
+        function = self.job.get_net_income_function()
+        incomes = [i * 37.21 for i in range(1000)] + [3500, 5653.85, 6365.38, 20000]
+        nets = self.job.get_annual_post_tax_incomes([income * 26 for income in incomes])
+        for income, net in zip(incomes, nets):
+            self.job._data['income'] = income
+            self.assertAlmostEqual(self.job.get_annual_post_tax_income(), net, delta=0.02)
+            self.assertAlmostEqual(net, function(income * 26), delta=1e-6)
+
+    def test_required_income(self):
+        targets = [i * 1234.5 for i in range(400)] + [30000, 62000.5]
+        incomes = self.job.get_required_incomes(targets)
+        self.assertEqual([round(t, 6) for t in targets],
+                         [round(n, 6) for n in self.job.get_annual_post_tax_incomes(incomes)])
+
+        income = self.job.get_required_income(2000, annual=False)
+        self.job._data['income'] = income
+        self.assertAlmostEqual(2000 * 26, self.job.get_annual_post_tax_income(), delta=0.02)
+        self.assertAlmostEqual(income * 26, self.job.get_required_income(52000), places=6)
+
+    def test_memoized_income(self):
+        net = self.job.get_annual_post_tax_income()
+        function = self.job.get_net_income_function()
+        self.job._data['income'] = 4000
+        self.job._assumptions['employer match'] = 4
+        self.assertIs(function, self.job.get_net_income_function())
+        self.assertNotEqual(net, self.job.get_annual_post_tax_income())
+        self.assertAlmostEqual(function(4000 * 26), self.job.get_annual_post_tax_income(), delta=0.02)
+
+        taxed = self.job.get_annual_taxed_amounts()
+        self.job._taxes[1].add_bracket(Bracket(4, 50000))
+        self.assertLess(self.job.get_annual_taxed_amounts()[1], taxed[1])
+        self.assertIsNot(function, self.job.get_net_income_function())
+
+        function = self.job.get_net_income_function()
+        net = self.job.get_annual_post_tax_income()
+        self.job._post_tax_deductions.add_expense(Expense('parking', 1200))
+        self.assertEqual(round(net - 1200, 6), round(self.job.get_annual_post_tax_income(), 6))
+        self.job._taxes.pop()
+        self.assertEqual((0, 0), self.job.get_annual_taxed_amounts()[1:])
+        self.assertIsNot(function, self.job.get_net_income_function())
+
+
+if __name__ == '__main__':
+    unittest.main()